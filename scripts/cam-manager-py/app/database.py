@@ -61,6 +61,12 @@ async def init_db():
             # Recording cloud upload fields
             "ALTER TABLE recordings ADD COLUMN IF NOT EXISTS cloud_url VARCHAR",
             "ALTER TABLE recordings ADD COLUMN IF NOT EXISTS camera_info JSONB",
+
+            # Partial indexes for the cleanup task's status scans
+            "CREATE INDEX IF NOT EXISTS idx_recordings_cleanup ON recordings (status) "
+            "WHERE status IN ('RECORDING', 'UPLOADED')",
+            "CREATE INDEX IF NOT EXISTS idx_recordings_upload_cleanup ON recordings (id) "
+            "WHERE cloud_url IS NOT NULL AND file_path <> '' AND status = 'UPLOADED'",
         ]
         for sql in migrations:
             try:
@@ -58,6 +58,8 @@ async def lifespan(app: FastAPI):
         await ensure_main_agent(db)
     yield
     # Shutdown
+    from app.tools.handlers import close_clients
+    await close_clients()
     await close_db()
     print("Shutdown complete")
 
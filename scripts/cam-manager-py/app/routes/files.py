@@ -5,7 +5,7 @@ import mimetypes
 from pathlib import Path
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
@@ -117,18 +117,14 @@ async def write_text_file(req: WriteRequest):
     }
 
 
-@router.post("/upload/{file_path:path}")
-async def upload_file(file_path: str, file: UploadFile = File(...)):
-    """Upload a binary file (images, media, etc). Creates parent directories."""
+async def _write_upload(file_path: str, chunks) -> dict:
+    """Stream chunks to a file under FILES_ROOT, enforcing MAX_UPLOAD_BYTES."""
     target = _safe_path(file_path)
     target.parent.mkdir(parents=True, exist_ok=True)
 
     with open(target, "wb") as f:
         total = 0
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
+        async for chunk in chunks:
             total += len(chunk)
             if total > MAX_UPLOAD_BYTES:
                 f.close()
@@ -146,6 +142,26 @@ async def upload_file(file_path: str, file: UploadFile = File(...)):
     }
 
 
+async def _iter_upload_file(file: UploadFile):
+    while True:
+        chunk = await file.read(1024 * 1024)
+        if not chunk:
+            break
+        yield chunk
+
+
+@router.post("/upload/{file_path:path}")
+async def upload_file(file_path: str, file: UploadFile = File(...)):
+    """Upload a binary file (images, media, etc). Creates parent directories."""
+    return await _write_upload(file_path, _iter_upload_file(file))
+
+
+@router.put("/upload/{file_path:path}")
+async def upload_file_raw(file_path: str, request: Request):
+    """Upload a binary file sent as the raw request body (no multipart envelope)."""
+    return await _write_upload(file_path, request.stream())
+
+
 @router.delete("/{file_path:path}")
 async def delete_file(file_path: str):
     """Delete a file or empty directory."""
@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
@@ -350,7 +351,17 @@ async def create_recording(
     )
     
     db.add(recording)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The recorder retries this POST when a response is lost; a repeat of an
+        # id we already stored returns the existing row instead of failing
+        await db.rollback()
+        result = await db.execute(select(Recording).where(Recording.id == data.id))
+        existing = result.scalar_one_or_none()
+        if existing is None:
+            raise
+        return existing.to_dict()
     await db.refresh(recording)
     
     return recording.to_dict()
@@ -3,8 +3,11 @@ Orphan pod cleanup task
 Removes camera pods that exist in K8s but not in database
 """
 import asyncio
-import os
+import hashlib
+import json
 import logging
+import os
+
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 
@@ -19,48 +22,179 @@ if _raw_db_url.startswith("postgresql://"):
 else:
     DATABASE_URL = _raw_db_url
 K8S_NAMESPACE = os.getenv("K8S_NAMESPACE", "falcon-eye")
+# Max in-flight file deletions during cleanup_uploaded_local_files
+DELETE_CONCURRENCY = int(os.getenv("CLEANUP_DELETE_CONCURRENCY", "20"))
+# Recordings claimed per batch in cleanup_uploaded_local_files
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "500"))
+# Force a full stale-resource sweep at least every N runs, even if the camera set is unchanged
+FULL_SWEEP_EVERY = int(os.getenv("CLEANUP_FULL_SWEEP_EVERY", "10"))
+# The sweep bookkeeping lives on this job's own CronJob, out of the user-facing settings table
+CLEANUP_CRONJOB = "falcon-eye-cleanup"
+SWEEP_STATE_ANNOTATION = "falcon-eye/cleanup-sweep-state"
+# Where older versions kept it; removed the first time the annotation is missing
+LEGACY_SWEEP_STATE_KEY = "_CLEANUP_SWEEP_STATE"
+
+# Label selectors
+SEL_CAMERA = "component=camera"
+SEL_RECORDER = "component=recorder"
+SEL_FILE_SERVER = "app=falcon-eye,component=file-server"
+
+
+_k8s_config_loaded = False
+_apps_api: client.AppsV1Api | None = None
+_core_api: client.CoreV1Api | None = None
+_batch_api: client.BatchV1Api | None = None
 
 
 def load_k8s_config():
-    """Load Kubernetes configuration"""
+    """Load Kubernetes configuration (once per process)"""
+    global _k8s_config_loaded
+    if _k8s_config_loaded:
+        return
     try:
         config.load_incluster_config()
         logger.info("Loaded in-cluster K8s config")
     except config.ConfigException:
         config.load_kube_config()
         logger.info("Loaded local K8s config")
+    _k8s_config_loaded = True
+
+
+def get_apps_api() -> client.AppsV1Api:
+    """Get the process-wide AppsV1Api client"""
+    global _apps_api
+    if _apps_api is None:
+        load_k8s_config()
+        _apps_api = client.AppsV1Api()
+    return _apps_api
+
+
+def get_core_api() -> client.CoreV1Api:
+    """Get the process-wide CoreV1Api client"""
+    global _core_api
+    if _core_api is None:
+        load_k8s_config()
+        _core_api = client.CoreV1Api()
+    return _core_api
+
+
+def get_batch_api() -> client.BatchV1Api:
+    """Get the process-wide BatchV1Api client"""
+    global _batch_api
+    if _batch_api is None:
+        load_k8s_config()
+        _batch_api = client.BatchV1Api()
+    return _batch_api
+
+
+# Per-run snapshot of pod LISTs keyed by label selector. The cleanup job is a
+# short-lived CronJob process, so a watch-based informer would be rebuilt
+# (with a full LIST) every run anyway; instead each selector is listed at
+# most once per run and shared by every phase that needs it.
+_pod_list_cache: dict[str, list] = {}
+
+
+def list_pods(label_selector: str) -> list:
+    """List pods matching label_selector, at most once per cleanup run.
+
+    Raises ApiException on failure (nothing is cached in that case).
+    """
+    pods = _pod_list_cache.get(label_selector)
+    if pods is None:
+        pods = get_core_api().list_namespaced_pod(
+            namespace=K8S_NAMESPACE,
+            label_selector=label_selector,
+        ).items
+        _pod_list_cache[label_selector] = pods
+    return pods
+
+
+def reset_pod_cache():
+    """Drop cached pod LISTs so the next run sees fresh cluster state"""
+    _pod_list_cache.clear()
 
 
 async def get_db_camera_ids() -> set[str]:
     """Get all camera IDs from database"""
-    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
     from sqlalchemy import text
-    
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
     engine = create_async_engine(DATABASE_URL)
     async with AsyncSession(engine) as session:
-        result = await session.execute(text("SELECT id::text FROM cameras"))
-        ids = {row[0] for row in result.fetchall()}
+        # Server-side cursor: rows arrive in chunks instead of one big fetchall()
+        result = await session.stream(
+            text("SELECT id::text FROM cameras").execution_options(yield_per=1000)
+        )
+        ids = {camera_id async for camera_id in result.scalars()}
     await engine.dispose()
     return ids
 
 
-def get_k8s_camera_pods() -> list[dict]:
-    """Get all camera pods from K8s"""
-    load_k8s_config()
-    core_api = client.CoreV1Api()
-    
+def load_sweep_state() -> tuple[str, int] | None:
+    """Load (camera-set digest, runs since last full sweep) from the CronJob annotation.
+
+    CronJob pods share no filesystem between runs, so the state is kept on the
+    CronJob object itself. Returns None when no state has been recorded yet.
+    """
+    try:
+        cronjob = get_batch_api().read_namespaced_cron_job(name=CLEANUP_CRONJOB, namespace=K8S_NAMESPACE)
+        value = (cronjob.metadata.annotations or {}).get(SWEEP_STATE_ANNOTATION)
+    except ApiException as e:
+        logger.warning(f"Failed to load cleanup sweep state: {e}")
+        return "", 0
+    if not value:
+        return None
+    digest, _, runs = value.partition(":")
     try:
-        pods = core_api.list_namespaced_pod(
+        return digest, int(runs or 0)
+    except (ValueError, TypeError):
+        # A hand-edited or corrupted annotation forces a full sweep rather than aborting the run
+        logger.warning(f"Ignoring malformed cleanup sweep state: {value!r}")
+        return "", 0
+
+
+def save_sweep_state(digest: str, runs_since_sweep: int):
+    """Persist the camera-set digest and run counter as a CronJob annotation"""
+    try:
+        get_batch_api().patch_namespaced_cron_job(
+            name=CLEANUP_CRONJOB,
             namespace=K8S_NAMESPACE,
-            label_selector="component=camera"
+            body={"metadata": {"annotations": {SWEEP_STATE_ANNOTATION: f"{digest}:{runs_since_sweep}"}}},
         )
+    except ApiException as e:
+        logger.warning(f"Failed to save cleanup sweep state: {e}")
+
+
+async def drop_legacy_sweep_state():
+    """Remove the sweep state row older versions kept in the settings table"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine(DATABASE_URL)
+    try:
+        async with AsyncSession(engine) as session:
+            await session.execute(
+                text("DELETE FROM settings WHERE key = :key"),
+                {"key": LEGACY_SWEEP_STATE_KEY},
+            )
+            await session.commit()
+    except Exception as e:
+        logger.warning(f"Failed to remove legacy cleanup sweep state: {e}")
+    finally:
+        await engine.dispose()
+
+
+def get_k8s_camera_pods() -> list[dict]:
+    """Get all camera pods from K8s"""
+    try:
+        pods = list_pods(SEL_CAMERA)
         return [
             {
                 "name": pod.metadata.name,
                 "camera_id": pod.metadata.labels.get("camera-id"),
                 "deployment": pod.metadata.labels.get("app"),
             }
-            for pod in pods.items
+            for pod in pods
             if pod.metadata.labels.get("camera-id")
         ]
     except ApiException as e:
@@ -68,88 +202,82 @@ def get_k8s_camera_pods() -> list[dict]:
         return []
 
 
-def delete_orphan_deployment(camera_id: str):
-    """Delete deployment and service for orphan camera"""
-    load_k8s_config()
-    apps_api = client.AppsV1Api()
-    core_api = client.CoreV1Api()
-    
-    # Find and delete camera deployment
-    try:
-        deployments = apps_api.list_namespaced_deployment(
-            namespace=K8S_NAMESPACE,
-            label_selector=f"camera-id={camera_id}"
-        )
-        for dep in deployments.items:
-            logger.info(f"Deleting orphan deployment: {dep.metadata.name}")
-            apps_api.delete_namespaced_deployment(
-                name=dep.metadata.name,
-                namespace=K8S_NAMESPACE
-            )
-    except ApiException as e:
-        if e.status != 404:
-            logger.error(f"Error deleting deployment: {e}")
-    
-    # Find and delete camera service
-    try:
-        services = core_api.list_namespaced_service(
-            namespace=K8S_NAMESPACE,
-            label_selector=f"camera-id={camera_id}"
-        )
-        for svc in services.items:
-            logger.info(f"Deleting orphan service: {svc.metadata.name}")
-            core_api.delete_namespaced_service(
-                name=svc.metadata.name,
-                namespace=K8S_NAMESPACE
-            )
-    except ApiException as e:
-        if e.status != 404:
-            logger.error(f"Error deleting service: {e}")
-    
-    # Find and delete recorder deployment (uses recorder-for label)
-    try:
-        deployments = apps_api.list_namespaced_deployment(
-            namespace=K8S_NAMESPACE,
-            label_selector=f"recorder-for={camera_id}"
-        )
-        for dep in deployments.items:
-            logger.info(f"Deleting orphan recorder deployment: {dep.metadata.name}")
-            apps_api.delete_namespaced_deployment(
-                name=dep.metadata.name,
-                namespace=K8S_NAMESPACE
-            )
-    except ApiException as e:
-        if e.status != 404:
-            logger.error(f"Error deleting recorder deployment: {e}")
-    
-    # Find and delete recorder service
+def _deleted_names(response) -> list[str]:
+    """Names of the objects a raw DELETECOLLECTION response reports as deleted"""
+    items = json.loads(response.data).get("items") or []
+    return [item["metadata"]["name"] for item in items]
+
+
+def _delete_matching(delete_collection, list_objects, delete_object, label_selector: str) -> list[str]:
+    """Delete the objects matching label_selector, returning their names.
+
+    Uses one DELETECOLLECTION. Falls back to LIST + per-item DELETE when it is
+    refused: 403 where the RBAC role predates the deletecollection verb, 405 on
+    kube-apiservers that don't serve it for the resource.
+    """
     try:
-        services = core_api.list_namespaced_service(
+        return _deleted_names(delete_collection(
             namespace=K8S_NAMESPACE,
-            label_selector=f"recorder-for={camera_id}"
-        )
-        for svc in services.items:
-            logger.info(f"Deleting orphan recorder service: {svc.metadata.name}")
-            core_api.delete_namespaced_service(
-                name=svc.metadata.name,
-                namespace=K8S_NAMESPACE
-            )
+            label_selector=label_selector,
+            _preload_content=False,
+        ))
     except ApiException as e:
-        if e.status != 404:
-            logger.error(f"Error deleting recorder service: {e}")
+        if e.status not in (403, 405):
+            raise
+    objects = list_objects(namespace=K8S_NAMESPACE, label_selector=label_selector).items
+    for obj in objects:
+        delete_object(name=obj.metadata.name, namespace=K8S_NAMESPACE)
+    return [obj.metadata.name for obj in objects]
+
+
+def delete_orphan_deployment(camera_id: str):
+    """Delete deployment and service for orphan camera"""
+    apps_api = get_apps_api()
+    core_api = get_core_api()
+
+    for label_selector, kind in (
+        (f"camera-id={camera_id}", "camera"),
+        (f"recorder-for={camera_id}", "recorder"),
+    ):
+        try:
+            for name in _delete_matching(
+                apps_api.delete_collection_namespaced_deployment,
+                apps_api.list_namespaced_deployment,
+                apps_api.delete_namespaced_deployment,
+                label_selector,
+            ):
+                logger.info(f"Deleted orphan {kind} deployment: {name}")
+        except ApiException as e:
+            if e.status != 404:
+                logger.error(f"Error deleting {kind} deployment: {e}")
+
+        try:
+            for name in _delete_matching(
+                core_api.delete_collection_namespaced_service,
+                core_api.list_namespaced_service,
+                core_api.delete_namespaced_service,
+                label_selector,
+            ):
+                logger.info(f"Deleted orphan {kind} service: {name}")
+        except ApiException as e:
+            if e.status != 404:
+                logger.error(f"Error deleting {kind} service: {e}")
 
 
-def cleanup_all_stale_resources(db_camera_ids: set[str]):
-    """Clean up ALL stale K8s resources not registered to any camera"""
-    load_k8s_config()
-    apps_api = client.AppsV1Api()
-    core_api = client.CoreV1Api()
-    
+def cleanup_all_stale_resources(db_camera_ids: set[str]) -> bool:
+    """Clean up ALL stale K8s resources not registered to any camera.
+
+    Returns False if any part of the sweep hit an API error.
+    """
+    apps_api = get_apps_api()
+    core_api = get_core_api()
+    ok = True
+
     # Clean up stale camera deployments
     try:
         deployments = apps_api.list_namespaced_deployment(
             namespace=K8S_NAMESPACE,
-            label_selector="component=camera"
+            label_selector=SEL_CAMERA
         )
         for dep in deployments.items:
             camera_id = dep.metadata.labels.get("camera-id")
@@ -158,12 +286,13 @@ def cleanup_all_stale_resources(db_camera_ids: set[str]):
                 apps_api.delete_namespaced_deployment(name=dep.metadata.name, namespace=K8S_NAMESPACE)
     except ApiException as e:
         logger.error(f"Error cleaning camera deployments: {e}")
-    
+        ok = False
+
     # Clean up stale camera services
     try:
         services = core_api.list_namespaced_service(
             namespace=K8S_NAMESPACE,
-            label_selector="component=camera"
+            label_selector=SEL_CAMERA
         )
         for svc in services.items:
             camera_id = svc.metadata.labels.get("camera-id")
@@ -172,12 +301,13 @@ def cleanup_all_stale_resources(db_camera_ids: set[str]):
                 core_api.delete_namespaced_service(name=svc.metadata.name, namespace=K8S_NAMESPACE)
     except ApiException as e:
         logger.error(f"Error cleaning camera services: {e}")
-    
+        ok = False
+
     # Clean up stale recorder deployments
     try:
         deployments = apps_api.list_namespaced_deployment(
             namespace=K8S_NAMESPACE,
-            label_selector="component=recorder"
+            label_selector=SEL_RECORDER
         )
         for dep in deployments.items:
             camera_id = dep.metadata.labels.get("recorder-for")
@@ -186,12 +316,13 @@ def cleanup_all_stale_resources(db_camera_ids: set[str]):
                 apps_api.delete_namespaced_deployment(name=dep.metadata.name, namespace=K8S_NAMESPACE)
     except ApiException as e:
         logger.error(f"Error cleaning recorder deployments: {e}")
-    
+        ok = False
+
     # Clean up stale recorder services
     try:
         services = core_api.list_namespaced_service(
             namespace=K8S_NAMESPACE,
-            label_selector="component=recorder"
+            label_selector=SEL_RECORDER
         )
         for svc in services.items:
             camera_id = svc.metadata.labels.get("recorder-for")
@@ -200,20 +331,17 @@ def cleanup_all_stale_resources(db_camera_ids: set[str]):
                 core_api.delete_namespaced_service(name=svc.metadata.name, namespace=K8S_NAMESPACE)
     except ApiException as e:
         logger.error(f"Error cleaning recorder services: {e}")
+        ok = False
+
+    return ok
 
 
 def get_running_recorder_camera_ids() -> set[str]:
     """Get camera IDs that have running recorder pods"""
-    load_k8s_config()
-    core_api = client.CoreV1Api()
-    
     try:
-        pods = core_api.list_namespaced_pod(
-            namespace=K8S_NAMESPACE,
-            label_selector="component=recorder"
-        )
+        pods = list_pods(SEL_RECORDER)
         running_ids = set()
-        for pod in pods.items:
+        for pod in pods:
             if pod.status.phase == "Running":
                 # Recorder uses "recorder-for" label
                 camera_id = pod.metadata.labels.get("recorder-for")
@@ -225,18 +353,30 @@ def get_running_recorder_camera_ids() -> set[str]:
         return set()
 
 
+# Constant SQL text so asyncpg's per-connection statement cache reuses one
+# prepared plan for every batch
+STOP_ORPHANED_RECORDINGS_SQL = """
+    UPDATE recordings
+    SET status = 'STOPPED',
+        end_time = :end_time,
+        error_message = 'Recording stopped: Recorder pod terminated'
+    WHERE id = ANY(:ids)
+"""
+
+
 async def fix_orphaned_recordings():
     """Fix recordings stuck in 'recording' status when recorder pod is gone"""
-    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    from datetime import datetime, timezone
+
     from sqlalchemy import text
-    from datetime import datetime
-    
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
     logger.info("Checking for orphaned recordings...")
-    
+
     # Get camera IDs with running recorders
     running_recorders = get_running_recorder_camera_ids()
     logger.info(f"Found {len(running_recorders)} running recorder pods")
-    
+
     engine = create_async_engine(DATABASE_URL)
     async with AsyncSession(engine) as session:
         # Find recordings marked as 'RECORDING' (enum is uppercase)
@@ -244,182 +384,246 @@ async def fix_orphaned_recordings():
             text("SELECT id, camera_id::text FROM recordings WHERE status = 'RECORDING'")
         )
         active_recordings = result.fetchall()
-        
-        fixed_count = 0
+
+        orphaned_ids = []
         for rec_id, camera_id in active_recordings:
             if camera_id not in running_recorders:
                 # Recorder pod is gone, mark recording as stopped
-                await session.execute(
-                    text("""
-                        UPDATE recordings 
-                        SET status = 'STOPPED', 
-                            end_time = :end_time,
-                            error_message = 'Recording stopped: Recorder pod terminated'
-                        WHERE id = :id
-                    """),
-                    {"id": rec_id, "end_time": datetime.utcnow()}
-                )
-                fixed_count += 1
-                logger.info(f"Fixed orphaned recording {rec_id} for camera {camera_id}")
-        
-        if fixed_count > 0:
+                orphaned_ids.append(rec_id)
+                logger.info(f"Fixing orphaned recording {rec_id} for camera {camera_id}")
+
+        if orphaned_ids:
+            # Single round-trip for all orphaned recordings
+            # end_time is a naive UTC column; strip tzinfo after taking an aware "now"
+            await session.execute(
+                text(STOP_ORPHANED_RECORDINGS_SQL),
+                {"ids": orphaned_ids, "end_time": datetime.now(timezone.utc).replace(tzinfo=None)}
+            )
             await session.commit()
-            logger.info(f"Fixed {fixed_count} orphaned recording(s)")
+            logger.info(f"Fixed {len(orphaned_ids)} orphaned recording(s)")
         else:
             logger.info("No orphaned recordings found")
-    
+
     await engine.dispose()
 
 
+async def _get_setting(http, key: str, default: str) -> str:
+    """Fetch a setting from the API (DB-backed), falling back to env."""
+    try:
+        api_url = os.getenv("API_URL", "http://falcon-eye-api:8000")
+        resp = await http.get(f"{api_url}/api/internal/settings/{key}", timeout=5)
+        if resp.status_code == 200:
+            return resp.json().get("value", default)
+    except Exception:
+        pass
+    return os.getenv(key, default)
+
+
+async def _delete_recording_file(row, http, sem: asyncio.Semaphore, recorder_pods_by_cam: dict) -> str | None:
+    """Delete one uploaded recording's file, locally or via its recorder pod.
+
+    Returns the recording id when the file is confirmed gone, else None.
+    """
+    rec_id, camera_id, file_path, file_name, node_name = row
+    async with sem:
+        # Try local delete first (off the event loop; paths may be on slow/NFS storage)
+        if file_path and await asyncio.to_thread(os.path.exists, file_path):
+            try:
+                await asyncio.to_thread(os.remove, file_path)
+                logger.info(f"Deleted local file: {file_path}")
+                return rec_id
+            except Exception as e:
+                logger.warning(f"Failed to delete local file {file_path}: {e}")
+
+        # File not on this node — try via recorder pod's DELETE endpoint
+        if not camera_id or not file_name:
+            return None
+
+        # Find recorder pod for this camera
+        for pod in recorder_pods_by_cam.get(camera_id, []):
+            if not pod.status.pod_ip or pod.status.phase != "Running":
+                continue
+            pod_ip = pod.status.pod_ip
+            url = f"http://{pod_ip}:8080/files/{camera_id}/{file_name}"
+            try:
+                del_res = await http.delete(url)
+                if del_res.status_code == 200:
+                    logger.info(f"Deleted remote file via recorder: {camera_id}/{file_name}")
+                    return rec_id
+                elif del_res.status_code == 404:
+                    logger.info(f"File already gone on recorder: {camera_id}/{file_name}")
+                    return rec_id
+            except Exception as e:
+                logger.warning(f"Failed to delete via recorder pod {pod_ip}: {e}")
+
+        # Recorder might be stopped — skip DB update, retry next cleanup cycle
+        logger.warning(f"Could not delete {camera_id}/{file_name} — recorder not available, will retry")
+        return None
+
+
 async def cleanup_uploaded_local_files():
     """Delete local recording files that have been successfully uploaded to cloud.
-    
+
     Uses the file-server DaemonSet to delete files on remote nodes since the
     cleanup job may not run on the same node as the recording.
     """
     import httpx
-    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    # One pooled client per run: keep-alive across the settings fetch and all
+    # recorder DELETEs instead of a fresh connection per file.
+    async with httpx.AsyncClient(
+        timeout=15,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    ) as http:
+        await _cleanup_uploaded_local_files(http)
+
+
+async def _cleanup_uploaded_local_files(http):
+    """Body of cleanup_uploaded_local_files, using a shared httpx client"""
     from sqlalchemy import text
-    
-    # Fetch setting from API (DB-backed), fallback to env
-    try:
-        import httpx as _httpx
-        api_url = os.getenv("API_URL", "http://falcon-eye-api:8000")
-        async with _httpx.AsyncClient() as _c:
-            _resp = await _c.get(f"{api_url}/api/internal/settings/CLOUD_DELETE_LOCAL", timeout=5)
-            cloud_delete = _resp.json().get("value", "true").lower() == "true" if _resp.status_code == 200 else os.getenv("CLOUD_DELETE_LOCAL", "true").lower() == "true"
-    except Exception:
-        cloud_delete = os.getenv("CLOUD_DELETE_LOCAL", "true").lower() == "true"
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    cloud_delete = (await _get_setting(http, "CLOUD_DELETE_LOCAL", "true")).lower() == "true"
     if not cloud_delete:
         logger.info("CLOUD_DELETE_LOCAL is false, skipping local cleanup")
         return
-    
+
     engine = create_async_engine(DATABASE_URL)
-    async with AsyncSession(engine) as session:
-        # Find recordings that have cloud_url AND still have a file_path
-        result = await session.execute(
-            text("""
-                SELECT id, camera_id::text, file_path, file_name, node_name
-                FROM recordings
-                WHERE cloud_url IS NOT NULL
-                  AND file_path IS NOT NULL AND file_path != ''
-                  AND status = 'UPLOADED'
-            """)
-        )
-        rows = result.fetchall()
-        
-        if not rows:
-            logger.info("No uploaded recordings with local files to clean")
-            await engine.dispose()
-            return
-        
-        logger.info(f"Found {len(rows)} uploaded recording(s) with local files to clean")
-        
-        # Get file-server pods for remote deletion
-        load_k8s_config()
-        core_api = client.CoreV1Api()
-        try:
-            fs_pods = core_api.list_namespaced_pod(
-                namespace=K8S_NAMESPACE,
-                label_selector="app=falcon-eye,component=file-server",
+    recorder_pods_by_cam = None
+    retry_ids: list[str] = []  # rows that could not be deleted this run
+    total_deleted = 0
+
+    # Claim batches with FOR UPDATE SKIP LOCKED so concurrent cleanup jobs
+    # never work on the same recordings; loop until the queue is drained.
+    while True:
+        async with AsyncSession(engine) as session:
+            # Find recordings that have cloud_url AND still have a file_path
+            result = await session.execute(
+                text("""
+                    SELECT id, camera_id::text, file_path, file_name, node_name
+                    FROM recordings
+                    WHERE cloud_url IS NOT NULL
+                      AND file_path IS NOT NULL AND file_path != ''
+                      AND status = 'UPLOADED'
+                      AND NOT (id = ANY(:retry_ids))
+                    ORDER BY id
+                    LIMIT :batch
+                    FOR UPDATE SKIP LOCKED
+                """),
+                {"retry_ids": retry_ids, "batch": CLEANUP_BATCH_SIZE},
             )
-            # Map node -> pod IP
-            node_pod_ips = {}
-            for pod in fs_pods.items:
-                if pod.status.pod_ip and pod.spec.node_name:
-                    node_pod_ips[pod.spec.node_name] = pod.status.pod_ip
-        except Exception as e:
-            logger.error(f"Failed to list file-server pods: {e}")
-            await engine.dispose()
-            return
-        
-        deleted_count = 0
-        for rec_id, camera_id, file_path, file_name, node_name in rows:
-            # Try local delete first
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Deleted local file: {file_path}")
-                    deleted_count += 1
-                    await session.execute(
-                        text("UPDATE recordings SET file_path = '' WHERE id = :id"),
-                        {"id": rec_id},
-                    )
-                    continue
-                except Exception as e:
-                    logger.warning(f"Failed to delete local file {file_path}: {e}")
-            
-            # File not on this node — try via recorder pod's DELETE endpoint
-            if not camera_id or not file_name:
-                continue
-            
-            # Find recorder pod for this camera
-            found_and_deleted = False
-            try:
-                rec_pods = core_api.list_namespaced_pod(
-                    namespace=K8S_NAMESPACE,
-                    label_selector=f"app=falcon-eye,component=recorder,recorder-for={camera_id}",
-                )
-                for pod in rec_pods.items:
-                    if not pod.status.pod_ip or pod.status.phase != "Running":
-                        continue
-                    pod_ip = pod.status.pod_ip
-                    async with httpx.AsyncClient(timeout=15) as http:
-                        url = f"http://{pod_ip}:8080/files/{camera_id}/{file_name}"
-                        try:
-                            del_res = await http.delete(url)
-                            if del_res.status_code == 200:
-                                logger.info(f"Deleted remote file via recorder: {camera_id}/{file_name}")
-                                found_and_deleted = True
-                                break
-                            elif del_res.status_code == 404:
-                                logger.info(f"File already gone on recorder: {camera_id}/{file_name}")
-                                found_and_deleted = True
-                                break
-                        except Exception as e:
-                            logger.warning(f"Failed to delete via recorder pod {pod_ip}: {e}")
-            except Exception as e:
-                logger.warning(f"Failed to find recorder pods for {camera_id}: {e}")
-            
-            if not found_and_deleted:
-                # Recorder might be stopped — skip DB update, retry next cleanup cycle
-                logger.warning(f"Could not delete {camera_id}/{file_name} — recorder not available, will retry")
-                continue
-            
-            # Only clear file_path in DB after confirmed deletion
-            await session.execute(
-                text("UPDATE recordings SET file_path = '' WHERE id = :id"),
-                {"id": rec_id},
+            rows = result.fetchall()
+
+            if not rows:
+                if total_deleted == 0 and not retry_ids:
+                    logger.info("No uploaded recordings with local files to clean")
+                break
+
+            logger.info(f"Found {len(rows)} uploaded recording(s) with local files to clean")
+
+            if recorder_pods_by_cam is None:
+                recorder_pods_by_cam = _list_recorder_pods_by_camera()
+                if recorder_pods_by_cam is None:
+                    break
+
+            sem = asyncio.Semaphore(DELETE_CONCURRENCY)
+            results = await asyncio.gather(
+                *(_delete_recording_file(row, http, sem, recorder_pods_by_cam) for row in rows),
+                return_exceptions=True,
             )
-            deleted_count += 1
-        
-        if deleted_count > 0:
+            deleted_ids = []
+            for row, r in zip(rows, results):
+                if isinstance(r, BaseException):
+                    logger.warning(f"File cleanup task failed: {r}")
+                if r and not isinstance(r, BaseException):
+                    deleted_ids.append(r)
+                else:
+                    retry_ids.append(row[0])
+
+            if deleted_ids:
+                await session.execute(
+                    text("UPDATE recordings SET file_path = '' WHERE id = ANY(:ids)"),
+                    {"ids": deleted_ids},
+                )
+                total_deleted += len(deleted_ids)
+            # Commit releases the row locks for this batch
             await session.commit()
-            logger.info(f"Cleaned up {deleted_count} recording file reference(s)")
-    
+
+        if len(rows) < CLEANUP_BATCH_SIZE:
+            break
+
+    if total_deleted > 0:
+        logger.info(f"Cleaned up {total_deleted} recording file reference(s)")
+
     await engine.dispose()
 
 
+def _list_recorder_pods_by_camera() -> dict[str, list] | None:
+    """List file-server and recorder pods; return recorder pods keyed by camera.
+
+    Returns None if the file-server pods cannot be listed.
+    """
+    try:
+        fs_pods = list_pods(SEL_FILE_SERVER)
+        # Map node -> pod IP
+        node_pod_ips = {}
+        for pod in fs_pods:
+            if pod.status.pod_ip and pod.spec.node_name:
+                node_pod_ips[pod.spec.node_name] = pod.status.pod_ip
+    except Exception as e:
+        logger.error(f"Failed to list file-server pods: {e}")
+        return None
+
+    # Index recorder pods by camera (shares the LIST done for orphaned recordings)
+    recorder_pods_by_cam: dict[str, list] = {}
+    try:
+        for pod in list_pods(SEL_RECORDER):
+            cam = (pod.metadata.labels or {}).get("recorder-for")
+            if cam:
+                recorder_pods_by_cam.setdefault(cam, []).append(pod)
+    except Exception as e:
+        logger.warning(f"Failed to list recorder pods: {e}")
+    return recorder_pods_by_cam
+
+
 async def cleanup_orphans():
     """Main cleanup function"""
     logger.info("=" * 50)
     logger.info("Starting cleanup task...")
     logger.info("=" * 50)
-    
+    reset_pod_cache()
+
     # 1. Fix orphaned recordings first
     await fix_orphaned_recordings()
-    
+
     # 2. Clean up local files for cloud-uploaded recordings
     await cleanup_uploaded_local_files()
-    
+
     # 3. Get camera IDs from database
     db_camera_ids = await get_db_camera_ids()
     logger.info(f"Found {len(db_camera_ids)} cameras in database")
-    
+
     # 4. Clean up ALL stale K8s resources (deployments + services for cameras + recorders)
-    logger.info("Cleaning up stale K8s resources...")
-    cleanup_all_stale_resources(db_camera_ids)
-    
+    #    Skipped when the camera set is unchanged since the last sweep, except
+    #    every FULL_SWEEP_EVERY runs to catch manually created objects.
+    digest = hashlib.sha1(",".join(sorted(db_camera_ids)).encode()).hexdigest()
+    state = load_sweep_state()
+    if state is None:
+        await drop_legacy_sweep_state()
+        state = ("", 0)
+    last_digest, runs_since_sweep = state
+    if digest == last_digest and runs_since_sweep + 1 < FULL_SWEEP_EVERY:
+        logger.info("Camera set unchanged since last sweep, skipping stale K8s resource cleanup")
+        save_sweep_state(digest, runs_since_sweep + 1)
+    else:
+        logger.info("Cleaning up stale K8s resources...")
+        if cleanup_all_stale_resources(db_camera_ids):
+            save_sweep_state(digest, 0)
+        else:
+            # Forget the digest so the next run sweeps again instead of skipping
+            logger.warning("Stale K8s resource sweep incomplete, retrying next run")
+            save_sweep_state("", 0)
+
     logger.info("=" * 50)
     logger.info("Cleanup complete")
     logger.info("=" * 50)
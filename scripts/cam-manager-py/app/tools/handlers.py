@@ -1,23 +1,67 @@
 """Tool handler implementations - execute tools by calling internal APIs"""
 import asyncio
-import base64
-import json
+import binascii
+import io
 import logging
 import os
 import re
+import subprocess
+import tempfile
+import time
 import uuid as _uuid
+import weakref
+from collections import Counter
+from datetime import UTC, datetime
+from html.parser import HTMLParser
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from urllib.parse import quote
 import httpx
+import orjson
 from app.config import get_settings
+from app.tools.registry import TOOLS_REGISTRY
+
+try:  # SIMD base64 for vision frames; binascii fallback
+    from pybase64 import b64encode_as_string as _b64_frame
+except ImportError:
+    def _b64_frame(frame: bytes) -> str:
+        return binascii.b2a_base64(frame, newline=False).decode("ascii")
+
+try:  # Optional: downscale vision frames before upload
+    from PIL import Image as _PILImage
+except ImportError:
+    _PILImage = None
 
 logger = logging.getLogger(__name__)
 
-settings = get_settings()
-import os as _os
-API_BASE = f"http://localhost:{settings.port}"
-_INTERNAL_KEY = _os.environ.get("INTERNAL_API_KEY", "")
+_INTERNAL_KEY = os.environ.get("INTERNAL_API_KEY", "")
 _INTERNAL_HEADERS = {"X-Internal-Key": _INTERNAL_KEY} if _INTERNAL_KEY else {}
 
+# Slug helpers: ASCII translate tables, with the regexes kept for non-ASCII input
+_SLUG_UNDERSCORE_RE = re.compile(r"[^a-z0-9]+")
+_SLUG_DASH_RE = re.compile(r"[^a-z0-9-]")
+_SLUG_KEEP = set(range(ord("a"), ord("z") + 1)) | set(range(ord("0"), ord("9") + 1))
+_SLUG_UNDERSCORE_TABLE = {c: "_" for c in range(128) if c not in _SLUG_KEEP}
+_SLUG_DASH_TABLE = {c: "-" for c in range(128) if c not in _SLUG_KEEP and c != ord("-")}
+
+
+def _slug_underscore(text: str) -> str:
+    """Lowercase; replace runs of non [a-z0-9] with '_' and trim underscores."""
+    text = text.lower()
+    if not text.isascii():
+        return _SLUG_UNDERSCORE_RE.sub("_", text).strip("_")
+    slug = text.translate(_SLUG_UNDERSCORE_TABLE)
+    while "__" in slug:
+        slug = slug.replace("__", "_")
+    return slug.strip("_")
+
+
+def _slug_dash(text: str) -> str:
+    """Lowercase; replace each non [a-z0-9-] char with '-' and trim dashes."""
+    text = text.lower()
+    if not text.isascii():
+        return _SLUG_DASH_RE.sub("-", text).strip("-")
+    return text.translate(_SLUG_DASH_TABLE).strip("-")
+
 # Tools that ephemeral (task-based) agents must NOT inherit, to prevent
 # recursive spawning loops and unintended scheduling side-effects.
 EPHEMERAL_EXCLUDED_TOOLS = {
@@ -26,46 +70,227 @@ EPHEMERAL_EXCLUDED_TOOLS = {
 }
 
 
+# ---------------------------------------------------------------------------
+#  Pooled HTTP clients
+# ---------------------------------------------------------------------------
+# One set of keep-alive clients per event loop: an AsyncClient bound to a
+# loop that has since closed fails with "Event loop is closed" on reuse.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_CLIENT_FACTORIES = {
+    # Internal API calls (/api/...)
+    "internal": lambda: httpx.AsyncClient(
+        base_url=f"http://localhost:{get_settings().port}",
+        headers=_INTERNAL_HEADERS,
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    ),
+    # Telegram Bot API
+    "telegram": lambda: httpx.AsyncClient(timeout=15),
+    # Outbound web requests (search)
+    "web": lambda: httpx.AsyncClient(timeout=15, follow_redirects=True),
+    # Vision model APIs; HTTP/2 is negotiated over TLS, plain-HTTP hosts (ollama) stay on 1.1
+    "llm": lambda: httpx.AsyncClient(
+        http2=True,
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=8),
+    ),
+    # User-defined endpoints (custom_api_call); shared by all agents, so Set-Cookie is never stored
+    "external": lambda: httpx.AsyncClient(
+        cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+        timeout=60,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    ),
+    # In-cluster camera MJPEG streams
+    "mjpeg": lambda: httpx.AsyncClient(
+        timeout=httpx.Timeout(15.0, read=30.0),
+        limits=httpx.Limits(max_keepalive_connections=32),
+    ),
+}
+
+
+def _client(kind: str) -> httpx.AsyncClient:
+    """Get the pooled client of the given kind for the running event loop."""
+    per_loop = _clients.setdefault(asyncio.get_running_loop(), {})
+    client = per_loop.get(kind)
+    if client is None or client.is_closed:
+        client = per_loop[kind] = _CLIENT_FACTORIES[kind]()
+    return client
+
+
+async def close_clients():
+    """Close the pooled clients for the running event loop (call on shutdown)."""
+    per_loop = _clients.pop(asyncio.get_running_loop(), {})
+    for client in per_loop.values():
+        await client.aclose()
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Strong references to fire-and-forget tasks so they aren't garbage-collected mid-flight
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _background_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.warning("Background tool task failed: %s", task.exception())
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    """Run a coroutine as a tracked background task."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_done)
+    return task
+
+
 async def _api_get(path: str) -> dict:
-    async with httpx.AsyncClient(timeout=30, headers=_INTERNAL_HEADERS) as client:
-        res = await client.get(f"{API_BASE}{path}")
-        if res.status_code >= 400:
-            raise Exception(f"API GET {path} returned {res.status_code}: {res.text[:300]}")
-        return res.json()
+    res = await _client("internal").get(path)
+    if res.status_code >= 400:
+        raise Exception(f"API GET {path} returned {res.status_code}: {res.text[:300]}")
+    return orjson.loads(res.content)
 
 
 async def _api_post(path: str, data: dict = None) -> dict:
-    async with httpx.AsyncClient(timeout=30, headers=_INTERNAL_HEADERS) as client:
-        res = await client.post(f"{API_BASE}{path}", json=data)
-        if res.status_code >= 400:
-            raise Exception(f"API POST {path} returned {res.status_code}: {res.text[:300]}")
-        return res.json()
+    _read_cache.clear()
+    if data is None:
+        res = await _client("internal").post(path)
+    else:
+        res = await _client("internal").post(path, content=orjson.dumps(data), headers=_JSON_HEADERS)
+    if res.status_code >= 400:
+        raise Exception(f"API POST {path} returned {res.status_code}: {res.text[:300]}")
+    return orjson.loads(res.content)
+
+
+async def _api_delete(path: str) -> dict:
+    _read_cache.clear()
+    res = await _client("internal").delete(path)
+    if res.status_code >= 400:
+        raise Exception(f"API DELETE {path} returned {res.status_code}: {res.text[:300]}")
+    return orjson.loads(res.content) if res.content else {}
+
+
+# Listing endpoints (cameras, nodes, recordings) are served from this cache for
+# READ_CACHE_TTL seconds, collapsing back-to-back tool calls into one request;
+# any internal POST/DELETE clears it
+READ_CACHE_TTL = 2.0
+_read_cache: dict[str, tuple[float, asyncio.Future]] = {}
+
+
+async def _api_get_cached(path: str) -> dict:
+    """_api_get for read-only listing endpoints; concurrent callers share one request."""
+    now = time.monotonic()
+    entry = _read_cache.get(path)
+    if entry is None or now - entry[0] >= READ_CACHE_TTL:
+        entry = _read_cache[path] = (now, asyncio.ensure_future(_api_get(path)))
+    try:
+        return await asyncio.shield(entry[1])
+    except Exception:
+        if _read_cache.get(path) is entry:
+            del _read_cache[path]
+        raise
+
+
+_CAMERA_LINE = "- **{name}** (id: `{id}`) — {status} | {protocol} on {node_name}"
 
 
 async def list_cameras(**kwargs) -> str:
-    result = await _api_get("/api/cameras/")
+    result = await _api_get_cached("/api/cameras/")
     cameras = result.get("cameras", [])
     if not cameras:
         return "No cameras found."
-    summary = []
-    for c in cameras:
-        summary.append(
-            f"- **{c['name']}** (id: `{c['id']}`) — {c['status']} | "
-            f"{c['protocol']} on {c.get('node_name', 'N/A')}"
-        )
-    return f"Found {len(cameras)} cameras:\n" + "\n".join(summary)
+    summary = "\n".join(
+        _CAMERA_LINE.format_map({"node_name": "N/A", **c}) for c in cameras
+    )
+    return f"Found {len(cameras)} cameras:\n{summary}"
+
+
+# Short-lived camera lookup cache for _resolve_camera_id
+CAMERA_CACHE_TTL = 5.0
+_NGRAM = 4
+_camera_cache: dict = {"t": 0.0, "by_name": {}, "names": [], "ngrams": {}}
+
+
+# Running cameras' details (service name etc.) for the stream-capture tools
+CAMERA_DETAIL_TTL = 30.0
+_camera_details: dict[str, tuple[float, dict]] = {}
+
+
+def _invalidate_camera_cache():
+    _camera_cache["t"] = 0.0
+    _camera_details.clear()
+    _read_cache.clear()
+
+
+async def _get_running_camera(camera_id: str) -> dict:
+    """GET /api/cameras/{id}, reusing a running camera's details for CAMERA_DETAIL_TTL.
+
+    Only running cameras are cached, so a camera started outside the tools
+    is picked up on the next call.
+    """
+    now = time.monotonic()
+    entry = _camera_details.get(camera_id)
+    if entry and now - entry[0] < CAMERA_DETAIL_TTL:
+        return entry[1]
+    cam = await _api_get(f"/api/cameras/{camera_id}")
+    if cam.get("status") == "running":
+        _camera_details[camera_id] = (now, cam)
+    return cam
+
+
+async def _camera_index() -> dict:
+    """Return the camera lookup cache, refreshing it if older than CAMERA_CACHE_TTL.
+
+    Holds ``by_name`` (exact lowercased name/deployment name -> id), ``names``
+    ([(name, deployment_name, id), ...] in API order) and ``ngrams``
+    (every 4-char substring of a name -> sorted indexes into ``names``).
+    """
+    now = time.monotonic()
+    if now - _camera_cache["t"] >= CAMERA_CACHE_TTL:
+        result = await _api_get_cached("/api/cameras/")
+        by_name: dict[str, str] = {}
+        names: list[tuple[str, str, str]] = []
+        ngrams: dict[str, list[int]] = {}
+        for idx, cam in enumerate(result.get("cameras", [])):
+            cam_id = str(cam["id"])
+            name = cam["name"].lower()
+            dep_name = (cam.get("deployment_name") or "").lower()
+            by_name.setdefault(name, cam_id)
+            if dep_name:
+                by_name.setdefault(dep_name, cam_id)
+            names.append((name, dep_name, cam_id))
+            grams = {text[i:i + _NGRAM] for text in (name, dep_name) for i in range(len(text) - _NGRAM + 1)}
+            for gram in grams:
+                ngrams.setdefault(gram, []).append(idx)
+        _camera_cache.update(t=now, by_name=by_name, names=names, ngrams=ngrams)
+    return _camera_cache
 
 
 async def _resolve_camera_id(camera_id: str) -> str:
     """Resolve a camera name/slug to UUID if needed."""
-    # If it looks like a UUID, return as-is
-    if len(camera_id) == 36 and "-" in camera_id:
+    # If it is a UUID, return as-is
+    try:
+        _uuid.UUID(camera_id)
         return camera_id
-    # Otherwise search by name
-    result = await _api_get("/api/cameras/")
-    for cam in result.get("cameras", []):
-        if camera_id.lower() in cam["name"].lower() or camera_id.lower() in cam.get("deployment_name", "").lower():
-            return str(cam["id"])
+    except ValueError:
+        pass
+    # Otherwise search by name: exact match first, then substring
+    index = await _camera_index()
+    query = camera_id.lower()
+    if query in index["by_name"]:
+        return index["by_name"][query]
+    names = index["names"]
+    if len(query) >= _NGRAM:
+        # Only cameras sharing the query's leading 4-gram can contain it
+        candidates = (names[i] for i in index["ngrams"].get(query[:_NGRAM], ()))
+    else:
+        candidates = names
+    for name, dep_name, cam_id in candidates:
+        if query in name or query in dep_name:
+            return cam_id
     return camera_id  # fallback
 
 
@@ -82,15 +307,100 @@ async def control_camera(camera_id: str, action: str, **kwargs) -> str:
     try:
         camera_id = await _resolve_camera_id(camera_id)
         result = await _api_post(f"/api/cameras/{camera_id}/{action}")
+        _invalidate_camera_cache()
         return f"Camera {action} result: {result.get('message', 'OK')}"
     except Exception as e:
         return f"Error controlling camera: {e}"
 
 
+# Upper bound on a single MJPEG frame; guards against streams that never end a frame
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";,\s]+)"?', re.IGNORECASE)
+
+
+def _parse_part_headers(raw: bytes) -> dict[str, str]:
+    """Parse multipart part headers into a lowercased-name dict."""
+    headers = {}
+    for line in raw.decode("latin-1").split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+async def _read_mjpeg_frame(resp: httpx.Response) -> bytes | None:
+    """Read the first complete JPEG frame from an MJPEG (multipart) response.
+
+    If the stream is multipart and the first part declares a Content-Length,
+    exactly that many bytes are read without scanning the payload. Otherwise
+    falls back to locating the JPEG SOI/EOI markers.
+    """
+    chunks = resp.aiter_bytes(chunk_size=8192)
+    buf = bytearray()
+
+    if _BOUNDARY_RE.search(resp.headers.get("content-type", "")):
+        hdr_end = -1
+        async for chunk in chunks:
+            buf.extend(chunk)
+            hdr_end = buf.find(b"\r\n\r\n")
+            if hdr_end != -1 or len(buf) > MAX_FRAME_BYTES:
+                break
+        if hdr_end == -1:
+            return None
+        length = _parse_part_headers(bytes(buf[:hdr_end])).get("content-length", "")
+        if length.isdigit():
+            if int(length) > MAX_FRAME_BYTES:
+                raise ValueError(f"Frame of {length} bytes exceeds {MAX_FRAME_BYTES // (1024 * 1024)} MiB limit")
+            body_start = hdr_end + 4
+            body_end = body_start + int(length)
+            while len(buf) < body_end:
+                chunk = await anext(chunks, None)
+                if chunk is None:
+                    return None
+                buf.extend(chunk)
+            return bytes(buf[body_start:body_end])
+
+    return await _scan_jpeg_frame(buf, chunks)
+
+
+async def _scan_jpeg_frame(buf: bytearray, chunks) -> bytes | None:
+    """Find the first SOI..EOI JPEG frame in ``buf`` plus following ``chunks``.
+
+    Only bytes not yet searched are scanned (minus one for a marker split
+    across chunks), so the cost is linear in frame size. Bytes before the SOI
+    marker are discarded as they are scanned, and a frame growing beyond
+    MAX_FRAME_BYTES without an EOI raises ValueError, so memory stays bounded.
+    """
+    start = -1
+    search = 0
+    while True:
+        if start == -1:
+            start = buf.find(b"\xff\xd8", search)
+            if start == -1:
+                # Keep only a trailing byte that may begin a split marker
+                del buf[:-1]
+                search = 0
+            else:
+                del buf[:start]
+                start = 0
+                search = 2
+        if start != -1:
+            end = buf.find(b"\xff\xd9", search)
+            if end != -1:
+                return bytes(buf[start : end + 2])
+            if len(buf) > MAX_FRAME_BYTES:
+                raise ValueError(f"Frame exceeded {MAX_FRAME_BYTES // (1024 * 1024)} MiB before EOI marker")
+            search = max(search, len(buf) - 1)
+        chunk = await anext(chunks, None)
+        if chunk is None:
+            return None
+        buf.extend(chunk)
+
+
 async def camera_snapshot(camera_id: str, **kwargs) -> str:
     camera_id = await _resolve_camera_id(camera_id)
     """Grab a single JPEG frame from a camera's MJPEG stream and save to filesystem."""
-    import time
 
     try:
         camera = await _api_get(f"/api/cameras/{camera_id}")
@@ -103,24 +413,15 @@ async def camera_snapshot(camera_id: str, **kwargs) -> str:
 
     stream_url = (
         f"http://{service_name}"
-        f".{settings.k8s_namespace}.svc.cluster.local:8081/"
+        f".{get_settings().k8s_namespace}.svc.cluster.local:8081/"
     )
 
     # Grab one JPEG frame from the MJPEG stream
     try:
         frame = None
-        async with httpx.AsyncClient(timeout=10) as client:
-            async with client.stream("GET", stream_url) as resp:
-                buf = b""
-                async for chunk in resp.aiter_bytes(chunk_size=8192):
-                    buf += chunk
-                    start = buf.find(b"\xff\xd8")
-                    if start == -1:
-                        continue
-                    end = buf.find(b"\xff\xd9", start)
-                    if end != -1:
-                        frame = buf[start : end + 2]
-                        break
+        timeout = httpx.Timeout(10, connect=5, read=5)
+        async with _client("mjpeg").stream("GET", stream_url, timeout=timeout) as resp:
+            frame = await _read_mjpeg_frame(resp)
         if not frame:
             return "Could not capture a frame from the camera stream."
     except httpx.TimeoutException:
@@ -129,17 +430,20 @@ async def camera_snapshot(camera_id: str, **kwargs) -> str:
         return f"Error capturing frame: {e}"
 
     # Save to shared filesystem via upload endpoint
-    cam_slug = re.sub(r"[^a-z0-9]+", "_", camera.get("name", "cam").lower()).strip("_")
-    filename = f"snapshots/{cam_slug}_{int(time.time())}.jpg"
+    cam_slug = _slug_underscore(camera.get("name", "cam"))
+    # Millisecond timestamp so two snapshots in the same second don't collide
+    filename = f"snapshots/{cam_slug}_{time.time_ns() // 1_000_000}.jpg"
 
     try:
-        async with httpx.AsyncClient(timeout=15, headers=_INTERNAL_HEADERS) as client:
-            resp = await client.post(
-                f"{API_BASE}/api/files/upload/{filename}",
-                files={"file": (os.path.basename(filename), frame, "image/jpeg")},
-            )
-            if resp.status_code != 200:
-                return f"Failed to save snapshot: {resp.text[:200]}"
+        # Raw-body upload: the frame goes on the wire as-is, no multipart envelope
+        resp = await _client("internal").put(
+            f"/api/files/upload/{filename}",
+            content=frame,
+            headers={"Content-Type": "image/jpeg"},
+            timeout=15,
+        )
+        if resp.status_code != 200:
+            return f"Failed to save snapshot: {resp.text[:200]}"
     except Exception as e:
         return f"Error saving snapshot: {e}"
 
@@ -150,7 +454,7 @@ async def start_recording(camera_id: str, **kwargs) -> str:
     camera_id = await _resolve_camera_id(camera_id)
     try:
         result = await _api_post(f"/api/cameras/{camera_id}/recording/start")
-        return f"Recording started: {json.dumps(result)}"
+        return f"Recording started: {orjson.dumps(result).decode()}"
     except Exception as e:
         return f"Error starting recording: {e}"
 
@@ -159,25 +463,28 @@ async def stop_recording(camera_id: str, **kwargs) -> str:
     camera_id = await _resolve_camera_id(camera_id)
     try:
         result = await _api_post(f"/api/cameras/{camera_id}/recording/stop")
-        return f"Recording stopped: {json.dumps(result)}"
+        return f"Recording stopped: {orjson.dumps(result).decode()}"
     except Exception as e:
         return f"Error stopping recording: {e}"
 
 
+def _recording_line(r: dict) -> str:
+    duration = r.get("duration_seconds")
+    dur = f"{duration}s" if duration else "in progress"
+    cloud = " ☁️" if r.get("cloud_url") else ""
+    return f"- {r['file_name']} ({r['status']}, {dur}{cloud}) [id: {r['id']}]"
+
+
 async def list_recordings(camera_id: str = None, **kwargs) -> str:
     path = "/api/recordings/"
     if camera_id:
         path += f"?camera_id={camera_id}"
-    result = await _api_get(path)
+    result = await _api_get_cached(path)
     recs = result.get("recordings", [])
     if not recs:
         return "No recordings found."
-    summary = []
-    for r in recs:
-        dur = f"{r.get('duration_seconds', '?')}s" if r.get("duration_seconds") else "in progress"
-        cloud = " ☁️" if r.get("cloud_url") else ""
-        summary.append(f"- {r['file_name']} ({r['status']}, {dur}{cloud}) [id: {r['id']}]")
-    return f"Found {len(recs)} recordings:\n" + "\n".join(summary) + "\n\n⚠️ IMPORTANT: To send a recording to the user, you MUST call the send_recording tool with the recording id. Do NOT share URLs directly — the user needs the video delivered inline."
+    summary = "\n".join(map(_recording_line, recs))
+    return f"Found {len(recs)} recordings:\n{summary}" + "\n\n⚠️ IMPORTANT: To send a recording to the user, you MUST call the send_recording tool with the recording id. Do NOT share URLs directly — the user needs the video delivered inline."
 
 
 async def get_recording(recording_id: str, **kwargs) -> str:
@@ -210,13 +517,18 @@ async def get_recording(recording_id: str, **kwargs) -> str:
         return f"Error getting recording: {e}"
 
 
+# Fields send_recording needs to build a media entry
+_RECORDING_MEDIA_FIELDS = {"id", "file_name", "cloud_url", "file_path", "duration_seconds", "file_size_bytes"}
+
+
 async def send_recording(recording_id: str, caption: str = "", **kwargs) -> str:
     """Send a recording to the user as an inline video.
     Accepts either a recording ID or a filename — resolves to the correct download URL."""
     try:
+        rec = None
         # If it looks like a filename, search recordings to find the ID
         if "." in recording_id and not recording_id.startswith("/"):
-            result = await _api_get("/api/recordings/")
+            result = await _api_get_cached("/api/recordings/")
             recs = result.get("recordings", [])
             match = None
             for r in recs:
@@ -230,9 +542,13 @@ async def send_recording(recording_id: str, caption: str = "", **kwargs) -> str:
                 dur = match.get("duration_seconds", "?")
                 camera = match.get("camera_name") or "camera"
                 caption = f"{match['file_name']} ({dur}s) — {camera}"
+            # List entries carry the same fields as the detail endpoint
+            if _RECORDING_MEDIA_FIELDS <= match.keys():
+                rec = match
 
         # Verify the recording exists
-        rec = await _api_get(f"/api/recordings/{recording_id}")
+        if rec is None:
+            rec = await _api_get(f"/api/recordings/{recording_id}")
         dl_url = f"/api/recordings/{recording_id}/download"
 
         if not caption:
@@ -265,14 +581,14 @@ async def send_recording(recording_id: str, caption: str = "", **kwargs) -> str:
 
 
 async def list_nodes(**kwargs) -> str:
-    result = await _api_get("/api/nodes/")
+    result = await _api_get_cached("/api/nodes/")
     if not result:
         return "No nodes found."
-    summary = []
-    for n in result:
-        status = "Ready" if n.get("ready") else "NotReady"
-        summary.append(f"- {n['name']} ({n.get('ip', 'N/A')}) — {status}")
-    return f"Found {len(result)} nodes:\n" + "\n".join(summary)
+    summary = "\n".join(
+        f"- {n['name']} ({n.get('ip', 'N/A')}) — {'Ready' if n.get('ready') else 'NotReady'}"
+        for n in result
+    )
+    return f"Found {len(result)} nodes:\n{summary}"
 
 
 async def scan_cameras(network: bool = True, **kwargs) -> str:
@@ -293,107 +609,171 @@ async def scan_cameras(network: bool = True, **kwargs) -> str:
 
 
 async def system_info(**kwargs) -> str:
-    nodes = await _api_get("/api/nodes/")
-    cameras = await _api_get("/api/cameras/")
+    nodes, cameras = await asyncio.gather(
+        _api_get_cached("/api/nodes/"), _api_get_cached("/api/cameras/"),
+    )
     cam_list = cameras.get("cameras", [])
-    running = sum(1 for c in cam_list if c["status"] == "running")
+    running = Counter(c["status"] for c in cam_list).get("running", 0)
     return (
         f"System Info:\n"
         f"- Nodes: {len(nodes)}\n"
         f"- Cameras: {len(cam_list)} total, {running} running\n"
-        f"- Namespace: {settings.k8s_namespace}"
+        f"- Namespace: {get_settings().k8s_namespace}"
     )
 
 
+# Seconds send_alert waits for Telegram deliveries before returning
+ALERT_FANOUT_WAIT = 2.0
+
+
 async def send_alert(message: str, severity: str = "info", **kwargs) -> str:
     """Send an alert: logs to the filesystem and pushes to Telegram agents if any exist."""
-    import time
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    timestamp = datetime.now(UTC).replace(tzinfo=None).isoformat(" ", "seconds")
     log_line = f"[{timestamp}] [{severity.upper()}] {message}"
 
-    # Append to alerts log on the shared filesystem
-    try:
-        await _api_post("/api/files/write", {
-            "path": "alerts/alerts.log",
-            "content": log_line + "\n",
-            "append": True,
-        })
-    except Exception:
-        pass
+    emoji = {"info": "ℹ️", "warning": "⚠️", "critical": "🚨"}.get(severity, "📢")
+    text = f"{emoji} **Falcon-Eye Alert** [{severity.upper()}]\n\n{message}"
+
+    async def _send_tg(agent: dict, bot_token: str, chat_id) -> str:
+        await _client("telegram").post(
+            f"https://api.telegram.org/bot{bot_token}/sendMessage",
+            content=orjson.dumps({"chat_id": chat_id, "text": text}),
+            headers=_JSON_HEADERS,
+            timeout=10,
+        )
+        return f"Telegram ({agent['name']})"
+
+    # Append to alerts log on the shared filesystem (in the background)
+    _spawn_background(_api_post("/api/files/write", {
+        "path": "alerts/alerts.log",
+        "content": log_line + "\n",
+        "append": True,
+    }))
 
-    # Try to push to Telegram-connected agents
+    # Push to Telegram-connected agents concurrently; report the ones that
+    # finish within ALERT_FANOUT_WAIT and let slower ones complete in the background
     delivered_to = []
+    pending = set()
     try:
         agents_res = await _api_get("/api/agents/")
-        for agent in agents_res.get("agents", []):
-            if agent.get("channel_type") == "telegram" and agent.get("status") == "running":
-                cfg = agent.get("channel_config") or {}
-                bot_token = cfg.get("bot_token")
-                chat_id = cfg.get("chat_id")
-                if bot_token and chat_id:
-                    emoji = {"info": "ℹ️", "warning": "⚠️", "critical": "🚨"}.get(severity, "📢")
-                    text = f"{emoji} **Falcon-Eye Alert** [{severity.upper()}]\n\n{message}"
-                    try:
-                        async with httpx.AsyncClient(timeout=10) as client:
-                            await client.post(
-                                f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                                json={"chat_id": chat_id, "text": text},
-                            )
-                        delivered_to.append(f"Telegram ({agent['name']})")
-                    except Exception:
-                        pass
+        tg_targets = [
+            (agent, cfg["bot_token"], cfg["chat_id"])
+            for agent in agents_res.get("agents", ())
+            if agent.get("channel_type") == "telegram" and agent.get("status") == "running"
+            for cfg in (agent.get("channel_config") or {},)
+            if cfg.get("bot_token") and cfg.get("chat_id")
+        ]
+        sends = [_spawn_background(_send_tg(*target)) for target in tg_targets]
+        if sends:
+            done, pending = await asyncio.wait(sends, timeout=ALERT_FANOUT_WAIT)
+            delivered_to = [t.result() for t in done if not t.exception()]
     except Exception:
         pass
 
     parts = [f"Alert logged: {log_line}"]
     if delivered_to:
         parts.append(f"Delivered to: {', '.join(delivered_to)}")
-    else:
+    elif not pending:
         parts.append("No Telegram channels available for push delivery.")
+    if pending:
+        parts.append(f"Still sending to {len(pending)} Telegram channel(s)")
     return " | ".join(parts)
 
 
+class _DDGResultParser(HTMLParser):
+    """Collect (url, title, snippet) from DuckDuckGo's HTML results page.
+
+    A single tokenizer pass over the page, keyed on the ``result__a`` and
+    ``result__snippet`` classes; text inside nested tags (e.g. ``<b>``) is
+    kept, the tags themselves are dropped. Stops once ``limit`` results with
+    both a title and a snippet have been collected (the rest of the page is
+    still tokenized but ignored).
+    """
+
+    def __init__(self, limit: int = 5):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.results: list[tuple[str, str, str]] = []
+        self._url = ""
+        self._title = ""
+        self._field: str | None = None  # "title" | "snippet" while capturing
+        self._tag = ""
+        self._depth = 0
+        self._text: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._field:
+            if tag == self._tag:
+                self._depth += 1
+            return
+        if len(self.results) >= self.limit:
+            return
+        attr_map = dict(attrs)
+        classes = (attr_map.get("class") or "").split()
+        if "result__a" in classes:
+            self._field = "title"
+            self._url = attr_map.get("href") or ""
+        elif "result__snippet" in classes and self._title:
+            self._field = "snippet"
+        else:
+            return
+        self._tag = tag
+        self._depth = 0
+        self._text = []
+
+    def handle_endtag(self, tag):
+        if not self._field or tag != self._tag:
+            return
+        if self._depth:
+            self._depth -= 1
+            return
+        text = "".join(self._text).strip()
+        if self._field == "title":
+            self._title = text
+        else:
+            if text:
+                self.results.append((self._url, self._title, text))
+            self._title = ""
+        self._field = None
+
+    def handle_data(self, data):
+        if self._field:
+            self._text.append(data)
+
+
 async def web_search(query: str, **kwargs) -> str:
     """Search the web using DuckDuckGo and return top results."""
     try:
-        async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
-            res = await client.get(
-                "https://html.duckduckgo.com/html/",
-                params={"q": query},
-                headers={"User-Agent": "Mozilla/5.0 (compatible; FalconEye/1.0)"},
-            )
-            if res.status_code != 200:
-                return f"Search request failed ({res.status_code})"
-
-            results = []
-            for match in re.finditer(
-                r'class="result__a"[^>]*href="([^"]*)"[^>]*>(.*?)</a>'
-                r'.*?class="result__snippet"[^>]*>(.*?)</(?:span|div)',
-                res.text,
-                re.DOTALL,
-            ):
-                url, title, snippet = match.groups()
-                title = re.sub(r"<[^>]+>", "", title).strip()
-                snippet = re.sub(r"<[^>]+>", "", snippet).strip()
-                if title and snippet:
-                    results.append(f"- **{title}**\n  {snippet}\n  {url}")
-                if len(results) >= 5:
-                    break
+        client = _client("web")
+        res = await client.get(
+            "https://html.duckduckgo.com/html/",
+            params={"q": query},
+            headers={"User-Agent": "Mozilla/5.0 (compatible; FalconEye/1.0)"},
+        )
+        if res.status_code != 200:
+            return f"Search request failed ({res.status_code})"
 
-            if results:
-                return f"Search results for '{query}':\n\n" + "\n\n".join(results)
+        parser = _DDGResultParser(limit=5)
+        parser.feed(res.text)
+        results = [
+            f"- **{title}**\n  {snippet}\n  {url}"
+            for url, title, snippet in parser.results
+        ]
 
-            # Fallback: try DuckDuckGo instant answer API
-            res2 = await client.get(
-                "https://api.duckduckgo.com/",
-                params={"q": query, "format": "json", "no_html": "1"},
-            )
-            data = res2.json()
-            abstract = data.get("AbstractText", "")
-            if abstract:
-                return f"Summary: {abstract}\nSource: {data.get('AbstractSource', '')}"
+        if results:
+            return f"Search results for '{query}':\n\n" + "\n\n".join(results)
+
+        # Fallback: try DuckDuckGo instant answer API
+        res2 = await client.get(
+            "https://api.duckduckgo.com/",
+            params={"q": query, "format": "json", "no_html": "1"},
+        )
+        data = orjson.loads(res2.content)
+        abstract = data.get("AbstractText", "")
+        if abstract:
+            return f"Summary: {abstract}\nSource: {data.get('AbstractSource', '')}"
 
-            return f"No results found for '{query}'."
+        return f"No results found for '{query}'."
     except Exception as e:
         return f"Search error: {e}"
 
@@ -417,8 +797,8 @@ async def spawn_agent(name: str, system_prompt: str = None, tools: list = None,
                 pass
 
         # Unique slug to prevent 409 collisions on repeated spawns
-        short_id = str(_uuid.uuid4())[:8]
-        slug = re.sub(r"[^a-z0-9-]", "-", name.lower()).strip("-")[:40]
+        short_id = _uuid.uuid4().hex[:8]
+        slug = _slug_dash(name)[:40]
         slug = f"{slug}-{short_id}"
 
         # For ephemeral (task) agents, strip out meta-tools that could cause loops
@@ -452,7 +832,7 @@ async def spawn_agent(name: str, system_prompt: str = None, tools: list = None,
         result = await _api_post("/api/agents/", payload)
         agent_id = result.get("id")
         if not agent_id:
-            return f"Failed to create agent: {json.dumps(result)}"
+            return f"Failed to create agent: {orjson.dumps(result).decode()}"
 
         if not task:
             # Persistent agent — create K8s Deployment (long-running)
@@ -495,7 +875,7 @@ async def delegate_task(agent_id: str, task: str, **kwargs) -> str:
                 "Start it first or use spawn_agent with a task."
             )
 
-        asyncio.create_task(
+        _spawn_background(
             _background_delegate_task(
                 agent_id=agent_id,
                 agent_name=agent_name,
@@ -546,8 +926,12 @@ async def _background_delegate_task(
 async def _wait_and_send_task(agent_id: str, task: str,
                               source_user: str | None = None,
                               retries: int = 20) -> str:
-    """Poll the agent until it's reachable, then send a task via the chat API."""
+    """Poll the agent until it's reachable, then send a task via the chat API.
+
+    Retries back off exponentially from 50ms, capped at 3s between attempts.
+    """
     last_error = ""
+    delay = 0.05
     for attempt in range(retries):
         try:
             result = await _api_post(f"/api/chat/{agent_id}/send", {
@@ -559,7 +943,8 @@ async def _wait_and_send_task(agent_id: str, task: str,
         except Exception as e:
             last_error = str(e)
             if attempt < retries - 1:
-                await asyncio.sleep(3)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 3.0)
 
     return f"(agent did not respond after {retries} attempts — last error: {last_error})"
 
@@ -602,11 +987,11 @@ async def _try_push_telegram(agent_id: str, message: str):
             bot_token = cfg.get("bot_token")
             chat_id = cfg.get("chat_id")
             if bot_token and chat_id:
-                async with httpx.AsyncClient(timeout=15) as client:
-                    await client.post(
-                        f"https://api.telegram.org/bot{bot_token}/sendMessage",
-                        json={"chat_id": chat_id, "text": message, "parse_mode": "Markdown"},
-                    )
+                await _client("telegram").post(
+                    f"https://api.telegram.org/bot{bot_token}/sendMessage",
+                    content=orjson.dumps({"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}),
+                    headers=_JSON_HEADERS,
+                )
     except Exception:
         pass
 
@@ -618,7 +1003,7 @@ async def clone_agent(source_agent_id: str, new_name: str, override_system_promp
         if "detail" in source:
             return f"Source agent not found: {source.get('detail')}"
 
-        slug = re.sub(r"[^a-z0-9-]", "-", new_name.lower()).strip("-")[:50]
+        slug = _slug_dash(new_name)[:50]
         payload = {
             "name": new_name,
             "slug": slug,
@@ -677,6 +1062,17 @@ async def create_cron_job(name: str, cron_expr: str, prompt: str,
         return f"Error creating cron job: {e}"
 
 
+def _cron_job_line(j: dict) -> str:
+    status = "enabled" if j.get("enabled") else "disabled"
+    last = j.get("last_status") or "never run"
+    prompt = j["prompt"]
+    return (
+        f"- **{j['name']}** (id: `{j['id']}`)\n"
+        f"  Schedule: `{j['cron_expr']}` | Status: {status} | Last: {last}\n"
+        f"  Prompt: {prompt[:80]}{'...' if len(prompt) > 80 else ''}"
+    )
+
+
 async def list_cron_jobs(**kwargs) -> str:
     """List all cron jobs for the calling agent."""
     agent_ctx = kwargs.get("_agent_context", {})
@@ -690,16 +1086,8 @@ async def list_cron_jobs(**kwargs) -> str:
         if not jobs:
             return "No cron jobs found."
 
-        lines = []
-        for j in jobs:
-            status = "enabled" if j.get("enabled") else "disabled"
-            last = j.get("last_status") or "never run"
-            lines.append(
-                f"- **{j['name']}** (id: `{j['id']}`)\n"
-                f"  Schedule: `{j['cron_expr']}` | Status: {status} | Last: {last}\n"
-                f"  Prompt: {j['prompt'][:80]}{'...' if len(j['prompt']) > 80 else ''}"
-            )
-        return f"Found {len(jobs)} cron job(s):\n\n" + "\n".join(lines)
+        lines = "\n".join(map(_cron_job_line, jobs))
+        return f"Found {len(jobs)} cron job(s):\n\n{lines}"
     except Exception as e:
         return f"Error listing cron jobs: {e}"
 
@@ -707,63 +1095,70 @@ async def list_cron_jobs(**kwargs) -> str:
 async def delete_cron_job(cron_id: str, **kwargs) -> str:
     """Delete a cron job by ID."""
     try:
-        async with httpx.AsyncClient(timeout=15, headers=_INTERNAL_HEADERS) as client:
-            res = await client.delete(f"{API_BASE}/api/cron/{cron_id}")
-            if res.status_code == 200:
-                return f"Cron job deleted (id: {cron_id})."
-            return f"Failed to delete cron job: {res.text[:200]}"
+        await _api_delete(f"/api/cron/{cron_id}")
+        return f"Cron job deleted (id: {cron_id})."
     except Exception as e:
         return f"Error deleting cron job: {e}"
 
 
-async def analyze_camera(camera_id: str, mode: str = "snapshot", duration: int = 5, **kwargs) -> str:
+async def analyze_camera(camera_id: str, mode: str = "snapshot", duration: int = 5,
+                         downscale: bool = True, **kwargs) -> str:
     camera_id = await _resolve_camera_id(camera_id)
     """Capture frame(s) from a camera's MJPEG stream and analyze with vision AI.
 
     Uses pure-Python MJPEG parsing (no ffmpeg dependency). In 'clip' mode,
-    captures one frame per second over ``duration`` seconds.
+    captures ``duration`` frames from one stream, CLIP_FRAME_INTERVAL seconds apart.
+
+    With ``downscale`` (and Pillow installed), frames are shrunk to
+    VISION_MAX_EDGE pixels on the long edge before upload.
 
     The ``_agent_context`` kwarg is injected by the chat route so we
     can use the calling agent's own LLM credentials for the vision call.
     """
-    import time as _time
-
     agent_ctx = kwargs.get("_agent_context", {})
 
     # 1. Resolve stream URL
     try:
-        cam = await _api_get(f"/api/cameras/{camera_id}")
+        cam = await _get_running_camera(camera_id)
         if cam.get("status") != "running":
             return f"Camera '{cam.get('name', camera_id)}' is not running (status: {cam.get('status')})"
 
         svc_name = cam.get("service_name")
         if not svc_name:
             return "Camera has no service — cannot capture."
-        stream_url = f"http://{svc_name}.{settings.k8s_namespace}.svc.cluster.local:8081/"
+        stream_url = f"http://{svc_name}.{get_settings().k8s_namespace}.svc.cluster.local:8081/"
     except Exception as e:
         return f"Error resolving camera stream: {e}"
 
     cam_name = cam.get("name", camera_id)
 
-    # 2. Capture frames from MJPEG stream (no ffmpeg needed)
+    # 2. Capture frames from MJPEG stream (no ffmpeg needed), base64-encoding
+    #    each one as it arrives so the raw JPEG isn't held alongside its encoding
+    if downscale and _PILImage is not None:
+        on_frame = _b64_downscaled_frame_in_thread
+    elif mode == "clip":
+        on_frame = _b64_frame_in_thread
+    else:
+        on_frame = _b64_frame
     try:
         if mode == "clip":
             duration = max(3, min(10, duration))
-            frames = await _capture_mjpeg_frames(stream_url, count=duration, interval=1.0)
+            b64_images = await _capture_mjpeg_frames(
+                stream_url, count=duration, interval=CLIP_FRAME_INTERVAL, on_frame=on_frame,
+            )
         else:
-            frames = await _capture_mjpeg_frames(stream_url, count=1, interval=0)
+            b64_images = await _capture_mjpeg_frames(stream_url, count=1, interval=0, on_frame=on_frame)
 
-        if not frames:
+        if not b64_images:
             return "Could not capture any frames from the camera stream."
     except httpx.TimeoutException:
         return f"Camera stream timed out. Ensure camera '{cam_name}' is running."
     except Exception as e:
         return f"Error capturing frames: {e}"
 
-    # 3. Encode to base64
-    b64_images = [base64.b64encode(f).decode() for f in frames]
+    span = (len(b64_images) - 1) * CLIP_FRAME_INTERVAL if mode == "clip" else 0.0
 
-    # 4. Send to vision LLM
+    # 3. Send to vision LLM
     provider = agent_ctx.get("provider", "openai")
     model = agent_ctx.get("model", "gpt-4o")
     api_key = (
@@ -772,7 +1167,7 @@ async def analyze_camera(camera_id: str, mode: str = "snapshot", duration: int =
         or os.getenv("OPENAI_API_KEY", "")
     )
     vision_prompt = (
-        f"These are {len(b64_images)} frame(s) captured over {duration} seconds "
+        f"These are {len(b64_images)} frame(s) captured over {span:.1f} seconds "
         f"from security camera '{cam_name}'. "
         "Describe what you see in detail. Note any people, their actions, "
         "objects, environment, activity, or anything unusual. "
@@ -787,49 +1182,117 @@ async def analyze_camera(camera_id: str, mode: str = "snapshot", duration: int =
                 "https://api.openai.com/v1" if provider == "openai"
                 else "http://ollama:11434/v1"
             )
-            description = await _vision_openai(api_key, model, base_url, b64_images, vision_prompt)
+            description = await _vision_openai(
+                api_key, model, base_url, b64_images, vision_prompt,
+                batch_scope=_vision_batch_scope(agent_ctx),
+            )
     except Exception as e:
         logger.error(f"Vision API call failed: provider={provider} model={model} error={e}")
         return f"Vision API call failed: {e}"
 
-    return f"[Camera: {cam_name} | Frames: {len(b64_images)} | Duration: {duration}s]\n{description}"
+    return f"[Camera: {cam_name} | Frames: {len(b64_images)} | Duration: {span:.1f}s]\n{description}"
+
+
+MJPEG_COMPACT_BYTES = 64 * 1024
+# Minimum spacing between clip-mode frames (cameras emit far faster than this)
+CLIP_FRAME_INTERVAL = 0.5
+
+
+# Long-edge size frames are shrunk to before vision upload; "low" detail
+# images are resized to 512px provider-side anyway
+VISION_MAX_EDGE = 768
+
+
+def _downscale_jpeg(frame: bytes) -> bytes:
+    """Shrink a JPEG to VISION_MAX_EDGE on its long edge (unchanged if already smaller)."""
+    with _PILImage.open(io.BytesIO(frame)) as img:
+        if max(img.size) <= VISION_MAX_EDGE:
+            return frame
+        # Let the JPEG decoder scale by 1/2..1/8 while decoding
+        img.draft("RGB", (VISION_MAX_EDGE, VISION_MAX_EDGE))
+        img.thumbnail((VISION_MAX_EDGE, VISION_MAX_EDGE))
+        out = io.BytesIO()
+        img.convert("RGB").save(out, format="JPEG", quality=82)
+    return out.getvalue()
+
+
+async def _b64_downscaled_frame_in_thread(frame: bytes | memoryview) -> str:
+    """Downscale and base64-encode a frame in a worker thread."""
+    return await asyncio.to_thread(lambda f: _b64_frame(_downscale_jpeg(f)), bytes(frame))
+
+
+async def _b64_frame_in_thread(frame: bytes | memoryview) -> str:
+    """Base64-encode a frame in a worker thread so clips don't stall the event loop.
+
+    The frame is copied first so the thread never holds a view into the
+    capture buffer.
+    """
+    return await asyncio.to_thread(_b64_frame, bytes(frame))
 
 
 async def _capture_mjpeg_frames(stream_url: str, count: int = 1,
-                                interval: float = 1.0) -> list[bytes]:
+                                interval: float = 1.0, on_frame=None) -> list:
     """Extract JPEG frames from an MJPEG stream without ffmpeg.
 
     Reads the stream, extracts ``count`` frames spaced ``interval`` seconds apart.
-    Returns a list of raw JPEG byte buffers.
+    Returns a list of raw JPEG byte buffers, or of ``on_frame(frame)`` results
+    if ``on_frame`` is given (applied as each frame is captured; may be async).
+    ``on_frame`` receives a memoryview that is only valid until it returns.
     """
-    import time as _time
-
-    frames: list[bytes] = []
+    frames: list = []
     timeout = max(15, count * interval + 10)
     last_capture = 0.0
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        async with client.stream("GET", stream_url) as resp:
-            buf = b""
-            async for chunk in resp.aiter_bytes(chunk_size=16384):
-                buf += chunk
-                while True:
-                    start = buf.find(b"\xff\xd8")
+    async with _client("mjpeg").stream("GET", stream_url, timeout=timeout) as resp:
+        # Consumed bytes are only dropped once ``pos`` passes
+        # MJPEG_COMPACT_BYTES, not re-sliced off after every frame.
+        # ``start`` is the SOI of the frame being assembled (-1 if none)
+        # and ``scan`` where its EOI search resumes, so each byte is
+        # searched once (plus one byte of overlap for split markers).
+        buf = bytearray()
+        pos = 0
+        start = -1
+        scan = 0
+        async for chunk in resp.aiter_bytes(chunk_size=131072):
+            buf.extend(chunk)
+            while True:
+                if start == -1:
+                    start = buf.find(b"\xff\xd8", pos)
                     if start == -1:
-                        buf = buf[-2:] if len(buf) > 2 else buf
-                        break
-                    end = buf.find(b"\xff\xd9", start + 2)
-                    if end == -1:
+                        pos = max(pos, len(buf) - 1)
                         break
-                    frame = buf[start : end + 2]
-                    buf = buf[end + 2 :]
-
-                    now = _time.monotonic()
-                    if now - last_capture >= interval or not frames:
-                        frames.append(frame)
-                        last_capture = now
-                        if len(frames) >= count:
-                            return frames
+                    pos = start
+                    scan = start + 2
+                end = buf.find(b"\xff\xd9", scan)
+                if end == -1:
+                    scan = max(scan, len(buf) - 1)
+                    break
+                frame_start, pos, start = start, end + 2, -1
+
+                now = time.monotonic()
+                if now - last_capture >= interval or not frames:
+                    if len(frames) == count - 1:
+                        # Last frame: release the camera stream before encoding it
+                        await resp.aclose()
+                    if on_frame:
+                        # on_frame gets a view into ``buf`` rather than a copy;
+                        # it is released before ``buf`` is next resized
+                        with memoryview(buf)[frame_start:pos] as frame:
+                            item = on_frame(frame)
+                            if asyncio.iscoroutine(item):
+                                item = await item
+                    else:
+                        item = bytes(buf[frame_start:pos])
+                    frames.append(item)
+                    last_capture = now
+                    if len(frames) >= count:
+                        return frames
+            if pos > MJPEG_COMPACT_BYTES:
+                del buf[:pos]
+                if start != -1:
+                    start -= pos
+                    scan -= pos
+                pos = 0
     return frames
 
 
@@ -840,10 +1303,6 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
     evenly-spaced frames using ffmpeg, then sends them to a vision model.
     The ``prompt`` parameter is passed as the query to the vision model.
     """
-    import subprocess
-    import tempfile
-    import glob
-
     agent_ctx = kwargs.get("_agent_context", {})
     max_frames = max(1, min(10, max_frames))
 
@@ -866,21 +1325,19 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
     #    Use the internal download endpoint which handles local/cloud/file-server
     tmp_video = None
     try:
-        api_key_header = _INTERNAL_HEADERS.copy()
         tmp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
-        async with httpx.AsyncClient(timeout=300) as client:
-            async with client.stream(
-                "GET",
-                f"{API_BASE}/api/recordings/{recording_id}/download",
-                headers=api_key_header,
-                follow_redirects=True,
-            ) as res:
-                if res.status_code != 200:
-                    tmp.close()
-                    os.remove(tmp.name)
-                    return f"Failed to download recording: HTTP {res.status_code}"
-                async for chunk in res.aiter_bytes(chunk_size=65536):
-                    tmp.write(chunk)
+        async with _client("internal").stream(
+            "GET",
+            f"/api/recordings/{recording_id}/download",
+            follow_redirects=True,
+            timeout=300,
+        ) as res:
+            if res.status_code != 200:
+                tmp.close()
+                os.remove(tmp.name)
+                return f"Failed to download recording: HTTP {res.status_code}"
+            async for chunk in res.aiter_bytes(chunk_size=1024 * 1024):
+                tmp.write(chunk)
         tmp.close()
         tmp_video = tmp.name
     except Exception as e:
@@ -898,40 +1355,19 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
         if duration <= 0:
             return "Could not determine recording duration — file may be corrupted."
 
-        # 4. Extract evenly-spaced frames using seek (fast, avoids full decode)
-        frame_dir = tempfile.mkdtemp(prefix="falcon_frames_")
+        # 4. Extract evenly-spaced frames using seek (fast, avoids full decode),
+        #    one ffmpeg per frame in parallel, and base64-encode them from stdout
         interval = duration / (max_frames + 1)  # +1 to avoid exact end
 
-        for i in range(max_frames):
-            seek_time = interval * (i + 1)
-            if seek_time >= duration:
-                break
-            frame_path = f"{frame_dir}/frame_{i:03d}.jpg"
-            extract_cmd = [
-                "ffmpeg", "-y",
-                "-ss", f"{seek_time:.2f}",
-                "-i", tmp_video,
-                "-frames:v", "1",
-                "-q:v", "2",
-                frame_path,
-            ]
-            try:
-                subprocess.run(extract_cmd, capture_output=True, timeout=30)
-            except subprocess.TimeoutExpired:
-                logger.warning(f"Frame extraction timed out at {seek_time:.1f}s")
-                continue
+        seek_times = [t for t in (interval * (i + 1) for i in range(max_frames)) if t < duration]
+        frames = await asyncio.gather(*(_extract_frame_jpeg(tmp_video, t) for t in seek_times))
+        b64_images = [_b64_frame(frame) for frame in frames if frame]
+        del frames
 
-        frame_files = sorted(glob.glob(f"{frame_dir}/frame_*.jpg"))
-        if not frame_files:
+        if not b64_images:
             return "Could not extract frames from recording."
 
-        # 5. Read frames and encode to base64
-        b64_images = []
-        for fpath in frame_files:
-            with open(fpath, "rb") as f:
-                b64_images.append(base64.b64encode(f.read()).decode())
-
-        # 6. Build vision prompt
+        # 5. Build vision prompt
         default_prompt = (
             f"These are {len(b64_images)} frame(s) extracted from a {duration:.0f}-second "
             f"recording from camera '{camera_name}'. "
@@ -941,7 +1377,7 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
         )
         vision_prompt = f"{prompt}\n\n{default_prompt}" if prompt else default_prompt
 
-        # 7. Send to vision LLM
+        # 6. Send to vision LLM
         provider = agent_ctx.get("provider", "openai")
         model = agent_ctx.get("model", "gpt-4o")
         api_key = (
@@ -958,7 +1394,10 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
                     "https://api.openai.com/v1" if provider == "openai"
                     else "http://ollama:11434/v1"
                 )
-                description = await _vision_openai(api_key, model, base_url, b64_images, vision_prompt)
+                description = await _vision_openai(
+                    api_key, model, base_url, b64_images, vision_prompt,
+                    batch_scope=_vision_batch_scope(agent_ctx),
+                )
         except Exception as e:
             logger.error(f"Vision API call failed for recording analysis: {e}")
             return f"Vision API call failed: {e}"
@@ -970,33 +1409,98 @@ async def analyze_recording(recording_id: str, prompt: str = "", max_frames: int
 
     finally:
         # Cleanup temp files
-        import shutil
         if tmp_video and os.path.exists(tmp_video):
             os.remove(tmp_video)
-        if 'frame_dir' in locals() and os.path.exists(frame_dir):
-            shutil.rmtree(frame_dir, ignore_errors=True)
 
 
-async def _vision_openai(api_key: str, model: str, base_url: str, b64_images: list[str], prompt: str) -> str:
+async def _extract_frame_jpeg(video_path: str, seek_time: float) -> bytes | None:
+    """Decode the frame at ``seek_time`` with ffmpeg; the JPEG is read from its stdout."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        # Container headers (moov) already describe the streams; frames are
+        # extracted in parallel, so keep each ffmpeg to one thread
+        "-probesize", "32k", "-analyzeduration", "0", "-threads", "1",
+        "-ss", f"{seek_time:.2f}",
+        "-i", video_path,
+        "-frames:v", "1",
+        # Fit within VISION_MAX_EDGE (never upscale), as analyze_camera does
+        "-vf", f"scale='min({VISION_MAX_EDGE},iw)':'min({VISION_MAX_EDGE},ih)':force_original_aspect_ratio=decrease",
+        "-q:v", "5",
+        "-f", "image2pipe", "-vcodec", "mjpeg", "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, err_tail, _ = await asyncio.wait_for(
+            asyncio.gather(proc.stdout.read(), _read_tail(proc.stderr), proc.wait()),
+            timeout=30,
+        )
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        logger.warning(f"Frame extraction timed out at {seek_time:.1f}s")
+        return None
+    if proc.returncode != 0 or not stdout:
+        logger.warning(
+            f"Frame extraction failed at {seek_time:.1f}s: {err_tail.decode(errors='replace')[-300:]}"
+        )
+        return None
+    return stdout
+
+
+async def _read_tail(stream: asyncio.StreamReader, limit: int = 4096) -> bytes:
+    """Drain ``stream``, keeping only its last ``limit`` bytes."""
+    tail = bytearray()
+    while chunk := await stream.read(limit):
+        tail += chunk
+        del tail[:-limit]
+    return bytes(tail)
+
+
+async def _vision_openai(api_key: str, model: str, base_url: str, b64_images: list[str], prompt: str,
+                         batch_scope: tuple | None = None) -> str:
     """Send images to an OpenAI-compatible vision endpoint.
     
     Dynamically adapts to the model:
     - GPT-5+ models require max_completion_tokens (not max_tokens)
     - GPT-5+ models don't support the 'detail' parameter on image_url
     - Older models (gpt-4o, gpt-4.1, etc.) use max_tokens + detail
+
+    Calls to api.openai.com with a ``batch_scope`` go through ``_vision_batcher``,
+    which may send them together with concurrent calls from the same scope
+    (agent and session) for the same model and key.
     """
-    # Detect if this is a GPT-5+ model
-    is_gpt5_plus = any(model.startswith(prefix) for prefix in ("gpt-5", "o3", "o4"))
-
-    content: list[dict] = [{"type": "text", "text": prompt}]
-    for img in b64_images:
-        image_entry: dict = {"url": f"data:image/jpeg;base64,{img}"}
-        if not is_gpt5_plus:
-            image_entry["detail"] = "low"
-        content.append({
-            "type": "image_url",
-            "image_url": image_entry,
-        })
+    if base_url == OPENAI_BASE_URL and batch_scope is not None:
+        return await _vision_batcher.submit(api_key, model, base_url, b64_images, prompt, batch_scope)
+    content = _openai_vision_content(model, b64_images, prompt)
+    _, text = await _vision_openai_post(api_key, model, base_url, content)
+    return text
+
+
+_JPEG_DATA_URL_PREFIX = "data:image/jpeg;base64,"
+
+
+def _is_gpt5_plus(model: str) -> bool:
+    return any(model.startswith(prefix) for prefix in ("gpt-5", "o3", "o4"))
+
+
+def _openai_vision_content(model: str, b64_images: list[str], prompt: str) -> list[dict]:
+    """Build the user-message content: the prompt text followed by its images."""
+    if _is_gpt5_plus(model):
+        return [{"type": "text", "text": prompt}] + [
+            {"type": "image_url", "image_url": {"url": _JPEG_DATA_URL_PREFIX + img}}
+            for img in b64_images
+        ]
+    return [{"type": "text", "text": prompt}] + [
+        {"type": "image_url", "image_url": {"url": _JPEG_DATA_URL_PREFIX + img, "detail": "low"}}
+        for img in b64_images
+    ]
+
+
+async def _vision_openai_post(api_key: str, model: str, base_url: str, content: list[dict],
+                              max_tokens: int = 1024) -> tuple[bool, str]:
+    """POST one chat completion; returns (ok, reply text or error message)."""
+    is_gpt5_plus = _is_gpt5_plus(model)
 
     headers = {"Content-Type": "application/json"}
     if api_key:
@@ -1008,17 +1512,136 @@ async def _vision_openai(api_key: str, model: str, base_url: str, b64_images: li
     }
     # GPT-5+ requires max_completion_tokens instead of max_tokens
     if is_gpt5_plus:
-        payload["max_completion_tokens"] = 1024
+        payload["max_completion_tokens"] = max_tokens
     else:
-        payload["max_tokens"] = 1024
+        payload["max_tokens"] = max_tokens
+
+    res = await _client("llm").post(
+        f"{base_url}/chat/completions", content=orjson.dumps(payload), headers=headers,
+    )
+    if res.status_code != 200:
+        body = res.text[:500]
+        logger.error(f"Vision OpenAI error: status={res.status_code} model={model} body={body}")
+        return False, f"Vision API error ({res.status_code}): {body}"
+    data = orjson.loads(res.content)
+    return True, data["choices"][0]["message"].get("content", "")
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        res = await client.post(f"{base_url}/chat/completions", json=payload, headers=headers)
-        if res.status_code != 200:
-            logger.error(f"Vision OpenAI error: status={res.status_code} model={model} body={res.text[:500]}")
-            return f"Vision API error ({res.status_code}): {res.text[:500]}"
-        data = res.json()
-        return data["choices"][0]["message"].get("content", "")
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+# Vision calls coalesced per (base_url, model, api_key, agent/session) within this window
+VISION_BATCH_WINDOW = 0.15
+VISION_BATCH_MAX = 4
+VISION_BATCH_MAX_IMAGES = 16
+_VISION_ANSWER_RE = re.compile(r"^=== ANSWER (\d+) ===[ \t]*$", re.MULTILINE)
+
+
+def _vision_batch_scope(agent_ctx: dict) -> tuple | None:
+    """Batching scope for a tool call: its agent and session, or None (never batch).
+
+    Prompts and images in one combined request can influence each other's
+    answers, so only calls from the same conversation are ever combined.
+    """
+    agent_id = agent_ctx.get("agent_id")
+    session_id = agent_ctx.get("session_id")
+    if not agent_id or not session_id:
+        return None
+    return agent_id, session_id
+
+
+def _split_vision_answers(text: str, count: int) -> list[str] | None:
+    """Split a combined reply into ``count`` answers, or None if it doesn't match."""
+    parts = _VISION_ANSWER_RE.split(text)
+    if (
+        len(parts) != 2 * count + 1
+        or parts[0].strip()
+        or parts[1::2] != [str(k) for k in range(1, count + 1)]
+    ):
+        return None
+    return [answer.strip() for answer in parts[2::2]]
+
+
+class _VisionBatcher:
+    """Coalesce concurrent OpenAI vision calls into a single request.
+
+    Calls sharing (base_url, model, api_key) and batch scope (the calling
+    agent and session, see _vision_batch_scope) that arrive within
+    VISION_BATCH_WINDOW seconds (up to VISION_BATCH_MAX calls and
+    VISION_BATCH_MAX_IMAGES images) are sent as one message asking for one
+    delimited answer per call. If the reply can't be split back into exactly
+    one answer per call, every call is re-sent on its own; if the request
+    itself fails (rate limit, server error), that error is every call's answer.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple, list] = {}
+
+    async def submit(self, api_key: str, model: str, base_url: str,
+                     b64_images: list[str], prompt: str, scope: tuple) -> str:
+        loop = asyncio.get_running_loop()
+        key = (base_url, model, api_key, scope)
+        batch = self._pending.get(key)
+        if batch and sum(len(images) for _, images, _ in batch) + len(b64_images) > VISION_BATCH_MAX_IMAGES:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(VISION_BATCH_WINDOW, self._flush, key, batch)
+        fut = loop.create_future()
+        batch.append((prompt, b64_images, fut))
+        if len(batch) >= VISION_BATCH_MAX:
+            self._flush(key, batch)
+        return await fut
+
+    def _flush(self, key: tuple, batch: list):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+            _spawn_background(self._run(key, batch))
+
+    async def _run(self, key: tuple, batch: list):
+        base_url, model, api_key, _ = key
+        try:
+            if len(batch) == 1:
+                prompt, images, _ = batch[0]
+                _, text = await _vision_openai_post(api_key, model, base_url, _openai_vision_content(model, images, prompt))
+                answers = [text]
+            else:
+                answers = await self._run_combined(api_key, model, base_url, batch)
+        except Exception as e:
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (*_, fut), answer in zip(batch, answers):
+            if not fut.done():
+                fut.set_result(answer)
+
+    @staticmethod
+    async def _run_combined(api_key: str, model: str, base_url: str, batch: list) -> list[str]:
+        count = len(batch)
+        content: list[dict] = [{"type": "text", "text": (
+            f"You are given {count} independent requests, each followed by its own image(s). "
+            "Answer each request separately, in order, considering only its own images. "
+            "Begin each answer with a line '=== ANSWER k ===' where k is the request number, "
+            "and write nothing before the first answer."
+        )}]
+        for k, (prompt, images, _) in enumerate(batch, 1):
+            content += _openai_vision_content(model, images, f"=== REQUEST {k} ===\n{prompt}")
+        ok, text = await _vision_openai_post(api_key, model, base_url, content, max_tokens=1024 * count)
+        if not ok:
+            # Re-sending N requests into a rate limit or outage only makes it worse
+            return [text] * count
+        answers = _split_vision_answers(text, count)
+        if answers is None:
+            logger.info(f"Vision batch of {count} could not be split; sending individually")
+            results = await asyncio.gather(*(
+                _vision_openai_post(api_key, model, base_url, _openai_vision_content(model, images, prompt))
+                for prompt, images, _ in batch
+            ))
+            answers = [text for _, text in results]
+        return answers
+
+
+_vision_batcher = _VisionBatcher()
 
 
 async def _vision_anthropic(api_key: str, model: str, b64_images: list[str], prompt: str) -> str:
@@ -1028,12 +1651,10 @@ async def _vision_anthropic(api_key: str, model: str, b64_images: list[str], pro
     if not api_key:
         return "Anthropic API key not configured — cannot run vision analysis."
 
-    content: list[dict] = []
-    for img in b64_images:
-        content.append({
-            "type": "image",
-            "source": {"type": "base64", "media_type": "image/jpeg", "data": img},
-        })
+    content: list[dict] = [
+        {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": img}}
+        for img in b64_images
+    ]
     content.append({"type": "text", "text": prompt})
 
     headers = {
@@ -1046,13 +1667,13 @@ async def _vision_anthropic(api_key: str, model: str, b64_images: list[str], pro
         "messages": [{"role": "user", "content": content}],
         "max_tokens": 1024,
     }
-    async with httpx.AsyncClient(timeout=60) as client:
-        res = await client.post("https://api.anthropic.com/v1/messages", json=payload, headers=headers)
-        if res.status_code != 200:
-            return f"Anthropic vision error ({res.status_code}): {res.text[:500]}"
-        data = res.json()
-        text_blocks = [b["text"] for b in data.get("content", []) if b.get("type") == "text"]
-        return " ".join(text_blocks) if text_blocks else "(no description returned)"
+    res = await _client("llm").post(
+        "https://api.anthropic.com/v1/messages", content=orjson.dumps(payload), headers=headers,
+    )
+    if res.status_code != 200:
+        return f"Anthropic vision error ({res.status_code}): {res.text[:500]}"
+    data = orjson.loads(res.content)
+    return " ".join(b["text"] for b in data.get("content", ()) if b.get("type") == "text") or "(no description returned)"
 
 
 async def file_write(path: str, content: str, **kwargs) -> str:
@@ -1075,6 +1696,20 @@ async def file_read(path: str, **kwargs) -> str:
         return f"Error reading file: {e}"
 
 
+def _file_line(f: dict) -> str:
+    if f["is_dir"]:
+        return f"  [DIR]  {f['name']}/"
+    size = f.get("size", 0)
+    unit = "B"
+    if size > 1024 * 1024:
+        size = size / (1024 * 1024)
+        unit = "MB"
+    elif size > 1024:
+        size = size / 1024
+        unit = "KB"
+    return f"  {f['name']}  ({size:.1f} {unit})"
+
+
 async def file_list(prefix: str = "", **kwargs) -> str:
     """List files and directories in the shared agent filesystem."""
     try:
@@ -1082,63 +1717,41 @@ async def file_list(prefix: str = "", **kwargs) -> str:
         files = result.get("files", [])
         if not files:
             return f"No files found in '{prefix or '/'}'."
-        lines = []
-        for f in files:
-            if f["is_dir"]:
-                lines.append(f"  [DIR]  {f['name']}/")
-            else:
-                size = f.get("size", 0)
-                unit = "B"
-                if size > 1024 * 1024:
-                    size = size / (1024 * 1024)
-                    unit = "MB"
-                elif size > 1024:
-                    size = size / 1024
-                    unit = "KB"
-                lines.append(f"  {f['name']}  ({size:.1f} {unit})")
-        return f"Files in '{prefix or '/'}':\n" + "\n".join(lines)
+        return f"Files in '{prefix or '/'}':\n" + "\n".join(_file_line(f) for f in files)
     except Exception as e:
         return f"Error listing files: {e}"
 
 
 PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".3gp"}
+_EXT_TO_MEDIA_TYPE = {**dict.fromkeys(PHOTO_EXTENSIONS, "photo"), **dict.fromkeys(VIDEO_EXTENSIONS, "video")}
 
-async def send_media(path: str, caption: str = "", media_type: str = "auto", **kwargs) -> str:
+async def send_media(path: str, caption: str = "", media_type: str = "auto",
+                     size: int | None = None, mime_type: str | None = None, **kwargs) -> str:
     """Queue a file or URL for delivery to the user's chat.
     Accepts: filesystem paths (e.g. 'snapshots/file.jpg'), API paths (e.g. '/api/recordings/{id}/download'),
-    or full URLs (e.g. 'https://...')."""
+    or full URLs (e.g. 'https://...'). Callers that already know the file's
+    ``size`` can pass it (and ``mime_type``) to skip the file-info lookup."""
     try:
         # Determine if this is an API path, full URL, or filesystem path
         is_api_path = path.startswith("/api/")
         is_full_url = path.startswith("http://") or path.startswith("https://")
         is_fs_path = not is_api_path and not is_full_url
 
-        info = {}
-        if is_fs_path:
+        info = {"size": size, "mime_type": mime_type} if size is not None else {}
+        if is_fs_path and size is None:
             info = await _api_get(f"/api/files/info/{path}")
             if info.get("is_dir"):
                 return f"Error: '{path}' is a directory, not a file."
 
         if media_type == "auto":
-            ext = os.path.splitext(path)[1].lower()
-            if ext in PHOTO_EXTENSIONS:
-                media_type = "photo"
-            elif ext in VIDEO_EXTENSIONS:
-                media_type = "video"
-            elif "/api/recordings/" in path and "/download" in path:
+            media_type = _EXT_TO_MEDIA_TYPE.get(os.path.splitext(path)[1].lower())
+            if media_type is None:
                 # Recording download URLs have no extension but are always video
-                media_type = "video"
-            else:
-                media_type = "document"
+                is_recording = "/api/recordings/" in path and "/download" in path
+                media_type = "video" if is_recording else "document"
 
-        if is_full_url:
-            url = path
-        elif is_api_path:
-            url = path
-        else:
-            encoded = "/".join(quote(seg, safe="") for seg in path.split("/"))
-            url = f"/api/files/read/{encoded}"
+        url = _url_for_path(path)
 
         media_entry = {
             "path": path,
@@ -1160,17 +1773,22 @@ async def send_media(path: str, caption: str = "", media_type: str = "auto", **k
         return f"Error preparing media: {e}"
 
 
+def _url_for_path(path: str) -> str:
+    """Delivery URL for a media path: API paths and full URLs as-is, else a file read URL."""
+    if path.startswith(("/api/", "http://", "https://")):
+        return path
+    return f"/api/files/read/{quote(path, safe='/')}"
+
+
 def _media_type_from_item(item: dict) -> str:
     """Map a structured media item to send_media's media_type."""
     try:
         raw_type = (item.get("type") or "").lower().lstrip(".")
         path = (item.get("path") or "").lower()
-        ext = raw_type or os.path.splitext(path)[1].lower().lstrip(".")
-        dot_ext = f".{ext}" if ext else ""
-        if dot_ext in PHOTO_EXTENSIONS:
-            return "photo"
-        if dot_ext in VIDEO_EXTENSIONS:
-            return "video"
+        ext = raw_type or os.path.splitext(path)[1].lstrip(".")
+        media_type = _EXT_TO_MEDIA_TYPE.get(f".{ext}")
+        if media_type:
+            return media_type
         # Recording download URLs have no extension
         if "/api/recordings/" in path and "/download" in path:
             return "video"
@@ -1213,32 +1831,21 @@ async def deliver_media_message(
     #    Mark as _already_persisted so callers don't save them again.
     queued = 0
     pending = ctx.get("pending_media")
-    for item in (media or []):
-        if not isinstance(item, dict):
-            continue
-        path = item.get("path")
-        if not path or not isinstance(path, str):
-            continue
-        caption = item.get("caption") or general_caption or ""
-        media_type = _media_type_from_item(item)
-        is_api_path = path.startswith("/api/")
-        is_full_url = path.startswith("http://") or path.startswith("https://")
-        if is_full_url:
-            url = path
-        elif is_api_path:
-            url = path
-        else:
-            encoded = "/".join(quote(seg, safe="") for seg in path.split("/"))
-            url = f"/api/files/read/{encoded}"
-        if pending is not None:
+    if pending is not None:
+        items = [
+            item for item in (media or ())
+            if isinstance(item, dict) and isinstance(item.get("path"), str) and item["path"]
+        ]
+        for item in items:
+            path = item["path"]
             pending.append({
                 "path": path,
-                "url": url,
-                "caption": caption,
-                "media_type": media_type,
+                "url": _url_for_path(path),
+                "caption": item.get("caption") or general_caption or "",
+                "media_type": _media_type_from_item(item),
                 "_already_persisted": True,
             })
-            queued += 1
+        queued = len(items)
 
     return f"Delivered {len(media or [])} media item(s) to session {resolved_session}. Queued {queued} attachment(s)."
 
@@ -1246,28 +1853,27 @@ async def deliver_media_message(
 async def file_delete(path: str, **kwargs) -> str:
     """Delete a file from the shared agent filesystem."""
     try:
-        async with httpx.AsyncClient(timeout=30, headers=_INTERNAL_HEADERS) as client:
-            res = await client.delete(f"{API_BASE}/api/files/{path}")
-            result = res.json()
+        result = await _api_delete(f"/api/files/{path}")
         return result.get("message", f"Deleted: {path}")
     except Exception as e:
         return f"Error deleting file: {e}"
 
 
+_CUSTOM_API_METHODS = {
+    "GET": lambda client, url, body: client.get(url, timeout=30),
+    "POST": lambda client, url, body: client.post(url, content=body, headers=_JSON_HEADERS, timeout=30),
+    "PUT": lambda client, url, body: client.put(url, content=body, headers=_JSON_HEADERS, timeout=30),
+    "DELETE": lambda client, url, body: client.delete(url, timeout=30),
+}
+
+
 async def custom_api_call(url: str, method: str = "GET", body: str = None, **kwargs) -> str:
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            if method == "GET":
-                res = await client.get(url)
-            elif method == "POST":
-                res = await client.post(url, content=body, headers={"Content-Type": "application/json"})
-            elif method == "PUT":
-                res = await client.put(url, content=body, headers={"Content-Type": "application/json"})
-            elif method == "DELETE":
-                res = await client.delete(url)
-            else:
-                return f"Unsupported method: {method}"
-            return f"Response ({res.status_code}): {res.text[:1000]}"
+        send = _CUSTOM_API_METHODS.get(method)
+        if send is None:
+            return f"Unsupported method: {method}"
+        res = await send(_client("external"), url, body)
+        return f"Response ({res.status_code}): {res.text[:1000]}"
     except Exception as e:
         return f"API call error: {e}"
 
@@ -1306,6 +1912,21 @@ HANDLER_MAP = {
 }
 
 
+# Tool function name -> (handler path, handler or None), built from TOOLS_REGISTRY
+_TOOL_INDEX: dict[str, tuple] = {}
+
+
+def refresh_handler_index():
+    """Rebuild the tool name -> handler index from TOOLS_REGISTRY and HANDLER_MAP."""
+    _TOOL_INDEX.clear()
+    for tool in TOOLS_REGISTRY.values():
+        # First registry entry wins for a duplicated name, as with a linear scan
+        _TOOL_INDEX.setdefault(tool["name"], (tool["handler"], HANDLER_MAP.get(tool["handler"])))
+
+
+refresh_handler_index()
+
+
 async def execute_tool(
     tool_name: str,
     arguments: dict,
@@ -1316,20 +1937,23 @@ async def execute_tool(
     Returns (result_text, media_items).  ``media_items`` is populated when a
     tool like ``send_media`` queues files for delivery.
     """
-    from app.tools.registry import TOOLS_REGISTRY
-
     if agent_context is None:
         agent_context = {}
     media_list: list[dict] = []
     agent_context["pending_media"] = media_list
-    arguments = {**arguments, "_agent_context": agent_context}
-
-    for tool_id, tool in TOOLS_REGISTRY.items():
-        if tool["name"] == tool_name:
-            handler_path = tool["handler"]
-            handler = HANDLER_MAP.get(handler_path)
-            if handler:
-                result = await handler(**arguments)
-                return result, media_list
-            return f"Handler not found: {handler_path}", []
-    return f"Unknown tool: {tool_name}", []
+
+    entry = _TOOL_INDEX.get(tool_name)
+    if entry is None:
+        # The registry may have changed since the index was built
+        refresh_handler_index()
+        entry = _TOOL_INDEX.get(tool_name)
+        if entry is None:
+            return f"Unknown tool: {tool_name}", []
+    handler_path, handler = entry
+    if handler:
+        if "_agent_context" in arguments:
+            # Never let caller-supplied arguments stand in for the real context
+            arguments = {k: v for k, v in arguments.items() if k != "_agent_context"}
+        result = await handler(**arguments, _agent_context=agent_context)
+        return result, media_list
+    return f"Handler not found: {handler_path}", []
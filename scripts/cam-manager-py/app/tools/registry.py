@@ -1,4 +1,5 @@
 """Tools registry - defines all available tools for agents"""
+from functools import lru_cache
 
 TOOLS_REGISTRY = {
     "camera_list": {
@@ -264,14 +265,14 @@ TOOLS_REGISTRY = {
     },
     "camera_analyze": {
         "name": "analyze_camera",
-        "description": "Capture frames from a camera and analyze what's happening using vision AI. In 'clip' mode, captures 1 frame per second over the duration (e.g. 5 frames over 5 seconds). Returns an AI-generated description of what the camera sees. Always use 'clip' mode when the user asks to analyze or describe what a camera is seeing.",
+        "description": "Capture frames from a camera and analyze what's happening using vision AI. In 'clip' mode, captures a burst of frames half a second apart (e.g. 5 frames over ~2 seconds). Returns an AI-generated description of what the camera sees. Always use 'clip' mode when the user asks to analyze or describe what a camera is seeing.",
         "category": "cameras",
         "parameters": {
             "type": "object",
             "properties": {
                 "camera_id": {"type": "string", "description": "Camera UUID"},
                 "mode": {"type": "string", "enum": ["snapshot", "clip"], "description": "Single frame (snapshot) or multi-frame analysis (clip). Use 'clip' for analyzing activity.", "default": "clip"},
-                "duration": {"type": "integer", "minimum": 3, "maximum": 10, "description": "Number of seconds to capture (clip mode). Each second = 1 frame.", "default": 5},
+                "duration": {"type": "integer", "minimum": 3, "maximum": 10, "description": "Number of frames to capture (clip mode), taken half a second apart.", "default": 5},
             },
             "required": ["camera_id"],
         },
@@ -407,10 +408,9 @@ TOOLS_REGISTRY = {
 }
 
 
-def get_openai_function_schema(tool_id: str) -> dict:
-    """Convert a tool registry entry to OpenAI function calling schema"""
-    tool = TOOLS_REGISTRY[tool_id]
-    return {
+# Built once at import; the registry is static so schemas are shared, not rebuilt per call
+_FUNCTION_SCHEMAS = {
+    tool_id: {
         "type": "function",
         "function": {
             "name": tool["name"],
@@ -418,25 +418,37 @@ def get_openai_function_schema(tool_id: str) -> dict:
             "parameters": tool["parameters"],
         },
     }
+    for tool_id, tool in TOOLS_REGISTRY.items()
+}
+
+
+def get_openai_function_schema(tool_id: str) -> dict:
+    """Convert a tool registry entry to OpenAI function calling schema"""
+    return _FUNCTION_SCHEMAS[tool_id]
+
+
+@lru_cache(maxsize=256)
+def _schemas_for(tool_ids: tuple[str, ...]) -> tuple[dict, ...]:
+    return tuple(_FUNCTION_SCHEMAS[tid] for tid in tool_ids if tid in _FUNCTION_SCHEMAS)
 
 
 def get_tools_for_agent(tool_ids: list[str]) -> list[dict]:
     """Get OpenAI function schemas for a list of tool IDs"""
-    return [get_openai_function_schema(tid) for tid in tool_ids if tid in TOOLS_REGISTRY]
+    return list(_schemas_for(tuple(tool_ids)))
+
+
+_GROUPED: dict[str, list[dict]] = {}
+for _tool_id, _tool in TOOLS_REGISTRY.items():
+    _GROUPED.setdefault(_tool["category"], []).append({
+        "id": _tool_id,
+        "name": _tool["name"],
+        "description": _tool["description"],
+        "category": _tool["category"],
+        "parameters": _tool["parameters"],
+    })
+del _tool_id, _tool
 
 
 def get_tools_grouped() -> dict:
-    """Get all tools grouped by category"""
-    grouped = {}
-    for tool_id, tool in TOOLS_REGISTRY.items():
-        cat = tool["category"]
-        if cat not in grouped:
-            grouped[cat] = []
-        grouped[cat].append({
-            "id": tool_id,
-            "name": tool["name"],
-            "description": tool["description"],
-            "category": cat,
-            "parameters": tool["parameters"],
-        })
-    return grouped
+    """Get all tools grouped by category (shared, precomputed at import; do not mutate)"""
+    return _GROUPED
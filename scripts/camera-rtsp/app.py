@@ -2,9 +2,13 @@
 Falcon-Eye RTSP/ONVIF Camera Relay
 Converts RTSP streams to MJPEG for web viewing
 """
+import fcntl
+import json
 import os
 import re
 import subprocess
+import threading
+import time
 from flask import Flask, Response
 
 app = Flask(__name__)
@@ -15,6 +19,26 @@ WIDTH = os.getenv("WIDTH", "640")
 HEIGHT = os.getenv("HEIGHT", "480")
 FPS = os.getenv("FPS", "15")
 CAMERA_LABEL = os.getenv("CAMERA_LABEL", "CAMERA")
+# HWACCEL=auto tries VA-API decode/scale on this render node; it is only used
+# once a probe has decoded a frame of the stream with it. Default is software.
+VAAPI_DEVICE = os.getenv("VAAPI_DEVICE", "/dev/dri/renderD128")
+HWACCEL = os.getenv("HWACCEL", "none")
+VAAPI_PROBE_TIMEOUT = 20
+
+PIPE_SIZE = 1 << 20
+PIPE_READ_SIZE = 256 * 1024
+# Seconds the shared upstream (ffmpeg / HTTP source) stays up after the last viewer leaves
+HUB_IDLE_TIMEOUT = float(os.getenv("HUB_IDLE_TIMEOUT", "10"))
+
+# Resolved ONVIF stream URL and when it was fetched; the SOAP lookup is slow
+# and the camera's RTSP URI rarely changes
+ONVIF_CACHE_TTL = 300
+_onvif_cache = None
+
+# Result of the VA-API probe: None until probed, then True/False for the process lifetime
+_vaapi_ok = None
+
+_ONVIF_RE = re.compile(r'onvif://(?:([^:]+):([^@]+)@)?([^:/]+)(?::(\d+))?')
 
 
 def get_rtsp_from_onvif(onvif_url: str) -> str:
@@ -22,7 +46,7 @@ def get_rtsp_from_onvif(onvif_url: str) -> str:
     try:
         from onvif import ONVIFCamera
         
-        match = re.match(r'onvif://(?:([^:]+):([^@]+)@)?([^:/]+)(?::(\d+))?', onvif_url)
+        match = _ONVIF_RE.match(onvif_url)
         if not match:
             return None
         
@@ -44,55 +68,214 @@ def get_rtsp_from_onvif(onvif_url: str) -> str:
 
 def get_stream_url() -> str:
     """Get the actual stream URL (resolve ONVIF if needed)"""
+    global _onvif_cache
     url = RTSP_URL
     if url.startswith('onvif://'):
+        if _onvif_cache and time.monotonic() - _onvif_cache[1] < ONVIF_CACHE_TTL:
+            return _onvif_cache[0]
         url = get_rtsp_from_onvif(url)
+        if url:
+            _onvif_cache = (url, time.monotonic())
     return url
 
 
-def gen_frames_ffmpeg(url):
-    """Generate MJPEG frames from RTSP/ONVIF stream via ffmpeg"""
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+
+def iter_multipart_frames(read, chunk_size=4096):
+    """Split a raw JPEG byte stream into frames wrapped in our multipart boundary.
+
+    Uses a bytearray buffer and resumes the end-marker search where the last
+    one stopped, so each byte is scanned once instead of on every chunk.
+    """
+    buf = bytearray()
+    scan_from = 2
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+
+        while True:
+            if not buf.startswith(JPEG_START):
+                start = buf.find(JPEG_START)
+                if start == -1:
+                    # Keep a trailing 0xff in case the marker straddles chunks
+                    del buf[:-1]
+                    break
+                del buf[:start]
+                scan_from = 2
+            end = buf.find(JPEG_END, scan_from)
+            if end == -1:
+                scan_from = max(2, len(buf) - 1)
+                break
+
+            frame = bytes(buf[:end + 2])
+            del buf[:end + 2]
+            scan_from = 2
+
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+
+VAAPI_INPUT_ARGS = [
+    '-hwaccel', 'vaapi',
+    '-hwaccel_device', VAAPI_DEVICE,
+    '-hwaccel_output_format', 'vaapi',
+]
+VAAPI_FILTER = f'scale_vaapi=w={WIDTH}:h={HEIGHT},hwdownload,format=nv12,format=yuvj420p'
+
+
+def _probe_vaapi(url):
+    """Decode one frame of the stream through the VA-API pipeline.
+
+    Returns True/False, or None when the probe timed out (camera slow or
+    unreachable), which says nothing about the GPU.
+    """
     cmd = [
+        'ffmpeg', '-v', 'error',
+        *VAAPI_INPUT_ARGS,
+        '-rtsp_transport', 'tcp',
+        '-i', url,
+        '-frames:v', '1',
+        '-vf', VAAPI_FILTER,
+        '-f', 'null', '-',
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                timeout=VAAPI_PROBE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return None
+    except OSError:
+        return False
+    return result.returncode == 0
+
+
+def use_vaapi(url) -> bool:
+    """Whether to decode and scale on the GPU via VA-API.
+
+    Only with HWACCEL=auto and the render node present, and only after a probe
+    shows the driver can actually decode this stream (codec profile, device
+    permissions). The outcome is remembered.
+    """
+    global _vaapi_ok
+    if HWACCEL != 'auto' or not os.path.exists(VAAPI_DEVICE):
+        return False
+    if _vaapi_ok is None:
+        ok = _probe_vaapi(url)
+        if ok is None:
+            print("VA-API probe timed out, using software decoding for now")
+            return False
+        _vaapi_ok = ok
+        print(f"VA-API probe {'succeeded' if ok else 'failed'}, using {'VA-API' if ok else 'software'} decoding")
+    return _vaapi_ok
+
+
+def ffmpeg_cmd(url, vaapi=False):
+    """Build the ffmpeg command that turns the stream into multipart MJPEG.
+
+    The mpjpeg muxer writes the --frame boundaries itself, so its output can be
+    forwarded to the client as-is.
+    """
+    if vaapi:
+        # Decode and scale on the GPU, download only the small frame for JPEG encoding
+        return [
+            'ffmpeg',
+            *VAAPI_INPUT_ARGS,
+            '-rtsp_transport', 'tcp',
+            '-i', url,
+            '-vf', VAAPI_FILTER,
+            '-f', 'mpjpeg',
+            '-boundary_tag', 'frame',
+            '-vcodec', 'mjpeg',
+            '-q:v', '5',
+            '-r', FPS,
+            'pipe:1'
+        ]
+    return [
         'ffmpeg',
         '-rtsp_transport', 'tcp',
         '-i', url,
-        '-f', 'image2pipe',
+        '-f', 'mpjpeg',
+        '-boundary_tag', 'frame',
         '-vcodec', 'mjpeg',
         '-q:v', '5',
         '-r', FPS,
         '-s', f'{WIDTH}x{HEIGHT}',
         'pipe:1'
     ]
-    
+
+
+_CONTENT_LENGTH_RE = re.compile(rb'Content-length:\s*(\d+)', re.IGNORECASE)
+
+
+def iter_mpjpeg_parts(read, chunk_size):
+    """Split ffmpeg's mpjpeg output into whole multipart parts.
+
+    Each part carries a Content-length header, so the body is skipped rather
+    than scanned for markers.
+    """
+    buf = bytearray()
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+
+        while True:
+            head_end = buf.find(b'\r\n\r\n')
+            if head_end == -1:
+                break
+            match = _CONTENT_LENGTH_RE.search(buf, 0, head_end)
+            if not match:
+                del buf[:head_end + 4]
+                continue
+            end = head_end + 4 + int(match.group(1)) + 2
+            if len(buf) < end:
+                break
+            part = bytes(buf[:end])
+            del buf[:end]
+            yield part
+
+
+def gen_frames_ffmpeg(url):
+    """Generate MJPEG frames from RTSP/ONVIF stream via ffmpeg.
+
+    If the VA-API pipeline exits without producing a frame, VA-API is switched
+    off for good and the stream is restarted with software decoding.
+    """
+    global _vaapi_ok
+    vaapi = use_vaapi(url)
+    parts = run_ffmpeg(ffmpeg_cmd(url, vaapi))
+    produced = False
+    try:
+        for part in parts:
+            produced = True
+            yield part
+    finally:
+        parts.close()
+    if vaapi and not produced:
+        print("VA-API ffmpeg exited without a frame, falling back to software decoding")
+        _vaapi_ok = False
+        yield from run_ffmpeg(ffmpeg_cmd(url))
+
+
+def run_ffmpeg(cmd):
+    """Run one ffmpeg command and yield its multipart parts"""
     print(f"Starting FFmpeg: {' '.join(cmd)}")
     proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-    
-    buf = b''
-    JPEG_START = b'\xff\xd8'
-    JPEG_END = b'\xff\xd9'
+    fd = proc.stdout.fileno()
+    try:
+        # Bigger pipe so ffmpeg is not throttled by a full 64KB buffer (Linux only)
+        fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except (AttributeError, OSError):
+        pass
     
     try:
-        while True:
-            chunk = proc.stdout.read(4096)
-            if not chunk:
-                break
-            buf += chunk
-            
-            while True:
-                start = buf.find(JPEG_START)
-                if start == -1:
-                    buf = b''
-                    break
-                end = buf.find(JPEG_END, start)
-                if end == -1:
-                    buf = buf[start:]
-                    break
-                
-                frame = buf[start:end + 2]
-                buf = buf[end + 2:]
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        # ffmpeg already frames the multipart stream; only split it into parts.
+        # os.read on the raw fd returns whatever is ready, up to PIPE_READ_SIZE
+        yield from iter_mpjpeg_parts(lambda n: os.read(fd, n), PIPE_READ_SIZE)
     except GeneratorExit:
         pass
     finally:
@@ -108,42 +291,22 @@ def gen_frames_http_proxy(url):
     
     print(f"Proxying HTTP MJPEG stream: {url}")
     
+    resp = None
     try:
         req = urllib.request.Request(url)
         resp = urllib.request.urlopen(req, timeout=30)
         
-        buf = b''
-        JPEG_START = b'\xff\xd8'
-        JPEG_END = b'\xff\xd9'
-        
-        while True:
-            chunk = resp.read(4096)
-            if not chunk:
-                break
-            buf += chunk
-            
-            while True:
-                start = buf.find(JPEG_START)
-                if start == -1:
-                    buf = b''
-                    break
-                end = buf.find(JPEG_END, start)
-                if end == -1:
-                    buf = buf[start:]
-                    break
-                
-                frame = buf[start:end + 2]
-                buf = buf[end + 2:]
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        yield from iter_multipart_frames(resp.read)
     except GeneratorExit:
         pass
     except Exception as e:
         print(f"HTTP proxy error: {e}")
+    finally:
+        if resp is not None:
+            resp.close()
 
 
-def gen_frames():
+def gen_source_frames():
     """Route to the right frame generator based on stream URL type"""
     url = get_stream_url()
     if not url:
@@ -158,6 +321,79 @@ def gen_frames():
         yield from gen_frames_ffmpeg(url)
 
 
+class FrameHub:
+    """One upstream reader per camera, fanned out to every connected viewer.
+
+    The first viewer starts a producer thread over gen_source_frames(); each
+    viewer then waits for the next published part. Slow viewers skip frames
+    rather than queueing them. The producer stops HUB_IDLE_TIMEOUT seconds
+    after the last viewer leaves, or when the source ends.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._running = False
+        self._generation = 0
+        self._viewers = 0
+        self._idle_since = 0.0
+        self._seq = 0
+        self._part = None
+
+    def _produce(self, generation):
+        parts = gen_source_frames()
+        try:
+            for part in parts:
+                with self._cond:
+                    if self._generation != generation:
+                        break
+                    self._part = part
+                    self._seq += 1
+                    self._cond.notify_all()
+                    if self._viewers == 0 and time.monotonic() - self._idle_since >= HUB_IDLE_TIMEOUT:
+                        self._running = False
+                        break
+        except Exception as e:
+            print(f"Stream producer error: {e}")
+        finally:
+            parts.close()
+            with self._cond:
+                if self._generation == generation:
+                    self._running = False
+                    self._cond.notify_all()
+
+    def frames(self):
+        """Yield multipart parts for one viewer"""
+        with self._cond:
+            self._viewers += 1
+            if not self._running:
+                self._running = True
+                self._generation += 1
+                threading.Thread(target=self._produce, args=(self._generation,), daemon=True).start()
+            seen = self._seq
+        try:
+            while True:
+                with self._cond:
+                    while self._running and self._seq == seen:
+                        self._cond.wait()
+                    if self._seq == seen:
+                        return
+                    seen, part = self._seq, self._part
+                yield part
+        finally:
+            with self._cond:
+                self._viewers -= 1
+                if self._viewers == 0:
+                    self._idle_since = time.monotonic()
+
+
+hub = FrameHub()
+
+
+def gen_frames():
+    """Stream the camera to one viewer via the shared hub"""
+    return hub.frames()
+
+
 @app.route('/')
 @app.route('/stream')
 def stream():
@@ -174,8 +410,26 @@ def health():
     return {'status': 'ok', 'camera': CAMERA_LABEL}
 
 
+_HEALTH_BODY = json.dumps({'status': 'ok', 'camera': CAMERA_LABEL}).encode()
+_HEALTH_HEADERS = [('Content-Type', 'application/json'), ('Content-Length', str(len(_HEALTH_BODY)))]
+
+
+def _health_shortcut(wsgi_app):
+    """Answer kubelet /health probes before Flask's routing and request setup"""
+    def wrapper(environ, start_response):
+        if environ.get('PATH_INFO') == '/health':
+            start_response('200 OK', _HEALTH_HEADERS)
+            return [_HEALTH_BODY]
+        return wsgi_app(environ, start_response)
+    return wrapper
+
+
+app.wsgi_app = _health_shortcut(app.wsgi_app)
+
+
 if __name__ == '__main__':
     print(f"Starting Falcon-Eye RTSP Relay for {CAMERA_LABEL}")
     print(f"Stream URL: {RTSP_URL}")
     print(f"Resolution: {WIDTH}x{HEIGHT} @ {FPS}fps")
+    print(f"VA-API: {'probed on first stream (' + VAAPI_DEVICE + ')' if HWACCEL == 'auto' else 'off'}")
     app.run(host='0.0.0.0', port=8081, threaded=True)
@@ -3,8 +3,13 @@ Falcon-Eye Cron Runner
 Executes a prompt against an agent via the main API, then delivers
 the response through the agent's configured channel (Telegram, etc.).
 """
+import asyncio
+import json
 import os
+import random
 import sys
+import tempfile
+from contextlib import ExitStack
 import httpx
 from datetime import datetime, timezone
 
@@ -18,6 +23,28 @@ INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "")
 
 TELEGRAM_API = "https://api.telegram.org"
 
+# Telegram responses worth retrying: flood control and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Media downloads stay in memory up to this size, then spill to disk
+MEDIA_SPOOL_BYTES = 2 * 1024 * 1024
+
+# Telegram's message limit, counted in UTF-16 code units
+TELEGRAM_TEXT_LIMIT = 4096
+
+# Bot API method and form field per media type; anything else goes as a document
+TELEGRAM_MEDIA_METHODS = {
+    "photo": ("sendPhoto", "photo"),
+    "video": ("sendVideo", "video"),
+}
+TELEGRAM_DOCUMENT_METHOD = ("sendDocument", "document")
+
+# sendMediaGroup takes 2-10 photos/videos per album
+TELEGRAM_ALBUM_MAX = 10
+
+# Concurrent Telegram requests per delivery (Telegram tolerates ~10)
+TELEGRAM_CONCURRENCY = 4
+
 def _api_headers() -> dict:
     h = {}
     if INTERNAL_API_KEY:
@@ -25,10 +52,49 @@ def _api_headers() -> dict:
     return h
 
 
-def fetch_agent_config(client: httpx.Client) -> dict:
+def _retry_after(res: httpx.Response) -> float | None:
+    """Seconds Telegram asked us to wait, from the header or the 429 body."""
+    value = res.headers.get("Retry-After")
+    if value is None and res.status_code == 429:
+        try:
+            value = res.json().get("parameters", {}).get("retry_after")
+        except Exception:
+            value = None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def post_with_retry(client: httpx.AsyncClient, url: str, *, max_attempts: int = 5,
+                    base: float = 0.5, cap: float = 8.0, **kw) -> httpx.Response:
+    """POST with exponential backoff and full jitter on 429/5xx and transport errors.
+
+    Honors Retry-After when Telegram sends it. Other 4xx responses are returned
+    immediately since retrying them cannot help.
+    """
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            res = await client.post(url, **kw)
+        except httpx.TransportError as e:
+            if last:
+                raise
+            print(f"POST {url.split('/bot')[0]} failed ({e}), retrying")
+            delay = None
+        else:
+            if res.status_code not in RETRY_STATUSES or last:
+                return res
+            delay = _retry_after(res)
+        if delay is None:
+            delay = random.uniform(0, min(cap, base * 2 ** attempt))
+        await asyncio.sleep(delay)
+
+
+async def fetch_agent_config(client: httpx.AsyncClient) -> dict:
     """Fetch agent config from the main API."""
     try:
-        res = client.get(f"{API_URL}/api/agents/{AGENT_ID}")
+        res = await client.get(f"{API_URL}/api/agents/{AGENT_ID}")
         if res.status_code == 200:
             return res.json()
     except Exception as e:
@@ -36,74 +102,242 @@ def fetch_agent_config(client: httpx.Client) -> dict:
     return {}
 
 
-def deliver_telegram(client: httpx.Client, bot_token: str, chat_id: int, text: str, media: list[dict] | None = None):
-    """Send the response (text + optional media) to a Telegram chat."""
+def iter_telegram_chunks(text: str, limit: int = TELEGRAM_TEXT_LIMIT):
+    """Split text into messages of at most `limit` UTF-16 code units.
+
+    Telegram counts astral characters (most emoji) as two units, so slicing by
+    Python characters can overflow. Cuts at the last whitespace when possible.
+    """
+    start = 0
+    units = 0  # code units in text[start:i]
+    cut = -1  # index just past the last whitespace in the current chunk
+    units_at_cut = 0
+    for i, ch in enumerate(text):
+        width = 2 if ord(ch) > 0xFFFF else 1
+        while units + width > limit and i > start:
+            if cut > start:
+                yield text[start:cut]
+                start, units = cut, units - units_at_cut
+            else:
+                yield text[start:i]
+                start, units = i, 0
+            cut = -1
+        units += width
+        if ch.isspace():
+            cut, units_at_cut = i + 1, units
+    if start < len(text):
+        yield text[start:]
+
+
+async def deliver_telegram(client: httpx.AsyncClient, bot_token: str, chat_id: int, text: str,
+                           media: list[dict] | None = None):
+    """Send the response (text + optional media) to a Telegram chat.
+
+    Text chunks go out in order from one task; media items are sent
+    concurrently alongside them, bounded by TELEGRAM_CONCURRENCY.
+    """
     base = f"{TELEGRAM_API}/bot{bot_token}"
+    sem = asyncio.Semaphore(TELEGRAM_CONCURRENCY)
 
-    if text:
-        for i in range(0, len(text), 4000):
-            chunk = text[i:i + 4000]
+    async def send_text():
+        for chunk in iter_telegram_chunks(text):
+            if not chunk.strip():
+                continue
             try:
-                res = client.post(f"{base}/sendMessage", json={"chat_id": chat_id, "text": chunk})
+                async with sem:
+                    res = await post_with_retry(client, f"{base}/sendMessage", json={"chat_id": chat_id, "text": chunk})
                 if res.status_code != 200:
                     print(f"Telegram sendMessage error: {res.text[:300]}")
             except Exception as e:
                 print(f"Telegram sendMessage failed: {e}")
 
-    for item in (media or []):
-        deliver_telegram_media(client, base, chat_id, item)
+    async def send_media(item: dict):
+        async with sem:
+            await deliver_telegram_media(client, base, chat_id, item)
+
+    async def send_album(items: list[dict]):
+        async with sem:
+            await deliver_telegram_album(client, base, chat_id, items)
+
+    # Photos and videos go out as albums of up to TELEGRAM_ALBUM_MAX; documents
+    # can't be grouped with them and are sent one by one
+    visual = [m for m in (media or []) if m.get("media_type") in TELEGRAM_MEDIA_METHODS]
+    tasks = [send_media(m) for m in (media or []) if m.get("media_type") not in TELEGRAM_MEDIA_METHODS]
+    for i in range(0, len(visual), TELEGRAM_ALBUM_MAX):
+        batch = visual[i:i + TELEGRAM_ALBUM_MAX]
+        tasks.append(send_album(batch) if len(batch) > 1 else send_media(batch[0]))
+    if text:
+        tasks.insert(0, send_text())
+    await asyncio.gather(*tasks)
+
+
+def _public_url(item: dict) -> str | None:
+    """An absolute URL for the item that Telegram could fetch itself, if any."""
+    url = item.get("url") or ""
+    if url.startswith(("http://", "https://")) and not url.startswith(API_URL):
+        return url
+    return None
 
 
-def deliver_telegram_media(client: httpx.Client, base_url: str, chat_id: int, item: dict):
-    """Download a file from the agent filesystem and send it to Telegram."""
+async def deliver_telegram_media(client: httpx.AsyncClient, base_url: str, chat_id: int, item: dict):
+    """Send a media item to Telegram.
+
+    Items with an externally reachable URL are handed to Telegram to fetch
+    directly; otherwise (or if Telegram can't fetch it) the file is downloaded
+    from the agent filesystem and uploaded.
+    """
     file_path = item.get("path", "")
     caption = item.get("caption", "")
     media_type = item.get("media_type", "document")
 
     try:
-        file_res = client.get(f"{API_URL}/api/files/read/{file_path}")
+        url = _public_url(item)
+        if url:
+            method, field = TELEGRAM_MEDIA_METHODS.get(media_type, TELEGRAM_DOCUMENT_METHOD)
+            params = {"chat_id": str(chat_id), field: url}
+            if caption:
+                params["caption"] = caption
+            res = await post_with_retry(client, f"{base_url}/{method}", data=params)
+            if res.status_code == 200:
+                print(f"Sent media by URL: {url} ({media_type})")
+                return
+            print(f"Telegram could not fetch {url}, uploading instead: {res.text[:300]}")
+
+        with tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_BYTES) as fh:
+            if not await _download_media(client, file_path, fh):
+                return
+            await _send_telegram_media(client, base_url, chat_id, file_path, media_type, caption, fh)
+
+    except Exception as e:
+        print(f"Failed to send media {file_path}: {e}")
+
+
+async def deliver_telegram_album(client: httpx.AsyncClient, base_url: str, chat_id: int, items: list[dict]):
+    """Send 2-10 photos/videos as one sendMediaGroup album.
+
+    Falls back to sending the items one by one if the album is rejected.
+    """
+    try:
+        with ExitStack() as stack:
+            album = []
+            files = {}
+            uploads = []
+            for i, item in enumerate(items):
+                entry = {"type": item["media_type"]}
+                if item.get("caption"):
+                    entry["caption"] = item["caption"]
+                url = _public_url(item)
+                if url:
+                    entry["media"] = url
+                else:
+                    name = f"f{i}"
+                    fh = stack.enter_context(tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_BYTES))
+                    uploads.append(_download_media(client, item.get("path", ""), fh))
+                    files[name] = (os.path.basename(item.get("path", "")) or name, fh)
+                    entry["media"] = f"attach://{name}"
+                album.append(entry)
+
+            if all(await asyncio.gather(*uploads)):
+                res = await post_with_retry(
+                    client, f"{base_url}/sendMediaGroup",
+                    data={"chat_id": str(chat_id), "media": json.dumps(album)},
+                    files=files or None,
+                )
+                if res.status_code == 200:
+                    print(f"Sent album of {len(items)} media item(s)")
+                    return
+                print(f"Telegram sendMediaGroup error, sending individually: {res.text[:300]}")
+    except Exception as e:
+        print(f"Failed to send album, sending individually: {e}")
+
+    for item in items:
+        await deliver_telegram_media(client, base_url, chat_id, item)
+
+
+async def _download_media(client: httpx.AsyncClient, file_path: str, fh) -> bool:
+    """Stream a file from the agent filesystem into fh and rewind it."""
+    async with client.stream("GET", f"{API_URL}/api/files/read/{file_path}") as file_res:
         if file_res.status_code != 200:
             print(f"Failed to download {file_path}: {file_res.status_code}")
-            return
+            return False
 
         content_type = file_res.headers.get("content-type", "")
         if "application/json" in content_type:
+            await file_res.aread()
             data = file_res.json()
-            if "content" in data:
-                file_bytes = data["content"].encode("utf-8")
-            else:
+            if "content" not in data:
                 print(f"No binary content for {file_path}")
-                return
-        else:
-            file_bytes = file_res.content
-
-        filename = os.path.basename(file_path)
-        files = {}
-        params = {"chat_id": str(chat_id)}
-        if caption:
-            params["caption"] = caption
-
-        if media_type == "photo":
-            endpoint = f"{base_url}/sendPhoto"
-            files = {"photo": (filename, file_bytes)}
-        elif media_type == "video":
-            endpoint = f"{base_url}/sendVideo"
-            files = {"video": (filename, file_bytes)}
+                return False
+            fh.write(data["content"].encode("utf-8"))
         else:
-            endpoint = f"{base_url}/sendDocument"
-            files = {"document": (filename, file_bytes)}
+            async for chunk in file_res.aiter_bytes(chunk_size=65536):
+                fh.write(chunk)
+    fh.seek(0)
+    return True
 
-        res = client.post(endpoint, data=params, files=files)
-        if res.status_code == 200:
-            print(f"Sent media: {file_path} ({media_type})")
-        else:
-            print(f"Telegram media send error: {res.text[:300]}")
 
+async def _send_telegram_media(client: httpx.AsyncClient, base_url: str, chat_id: int, file_path: str,
+                               media_type: str, caption: str, fh):
+    """Upload a downloaded file to Telegram; httpx streams it from the file handle."""
+    filename = os.path.basename(file_path)
+    params = {"chat_id": str(chat_id)}
+    if caption:
+        params["caption"] = caption
+
+    method, field = TELEGRAM_MEDIA_METHODS.get(media_type, TELEGRAM_DOCUMENT_METHOD)
+    files = {field: (filename, fh)}
+
+    res = await post_with_retry(client, f"{base_url}/{method}", data=params, files=files)
+    if res.status_code == 200:
+        print(f"Sent media: {file_path} ({media_type})")
+    else:
+        print(f"Telegram media send error: {res.text[:300]}")
+
+
+async def _read_head(res: httpx.Response, limit: int) -> str:
+    """Read at most ``limit`` bytes of a streamed body, leaving the rest unread."""
+    buf = bytearray()
+    async for chunk in res.aiter_bytes():
+        buf += chunk
+        if len(buf) >= limit:
+            break
+    return buf[:limit].decode(res.encoding or "utf-8", errors="replace")
+
+
+async def deliver_response(client: httpx.AsyncClient, config_task: asyncio.Task,
+                           result_text: str, media: list[dict]):
+    """Deliver the agent's reply through its channel, if it has Telegram configured."""
+    agent_config = await config_task
+    channel_type = agent_config.get("channel_type")
+    channel_config = agent_config.get("channel_config") or {}
+
+    if channel_type == "telegram":
+        bot_token = channel_config.get("bot_token")
+        chat_id = channel_config.get("chat_id")
+        if bot_token and chat_id:
+            print(f"Delivering to Telegram chat_id={chat_id}")
+            await deliver_telegram(client, bot_token, chat_id, result_text, media)
+        elif not chat_id:
+            print("Telegram delivery skipped — no chat_id yet (send a message to the bot first)")
+
+
+async def report_status(client: httpx.AsyncClient, status: str, result_text: str):
+    """PATCH the cron job with this run's outcome."""
+    try:
+        await client.patch(
+            f"{API_URL}/api/cron/{CRON_JOB_ID}",
+            json={
+                "last_run": datetime.now(timezone.utc).isoformat(),
+                "last_result": result_text[:500],
+                "last_status": status,
+            },
+        )
+        print(f"Reported status: {status}")
     except Exception as e:
-        print(f"Failed to send media {file_path}: {e}")
+        print(f"Failed to report status: {e}")
 
 
-def main():
+async def main():
     if not AGENT_ID or not PROMPT:
         print("ERROR: AGENT_ID and PROMPT are required")
         sys.exit(1)
@@ -115,62 +349,55 @@ def main():
     result_text = ""
     media = []
 
-    with httpx.Client(timeout=TIMEOUT_SECONDS + 10, headers=_api_headers()) as client:
+    # One keep-alive client for the API and Telegram; HTTP/2 multiplexes the Telegram sends
+    async with httpx.AsyncClient(
+        timeout=TIMEOUT_SECONDS + 10,
+        headers=_api_headers(),
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+    ) as client:
+        # The agent config doesn't depend on the reply, so fetch it while the agent runs
+        config_task = asyncio.create_task(fetch_agent_config(client))
+
         # 1. Send prompt to agent
         try:
             payload = {"message": PROMPT, "source": "cron"}
             if SESSION_ID:
                 payload["session_id"] = SESSION_ID
-            res = client.post(
+            # Streamed so an error body is cut off at the transport level; a
+            # successful reply is read whole since Telegram delivery needs all of it
+            async with client.stream(
+                "POST",
                 f"{API_URL}/api/chat/{AGENT_ID}/send",
                 json=payload,
-            )
-            if res.status_code == 200:
-                data = res.json()
-                result_text = data.get("response", "")
-                media = data.get("media", [])
-                print(f"Response: {result_text[:200]}...")
-            else:
-                status = "error"
-                result_text = f"API error ({res.status_code}): {res.text[:300]}"
-                print(f"ERROR: {result_text}")
+            ) as res:
+                if res.status_code == 200:
+                    data = json.loads(await res.aread())
+                    result_text = data.get("response", "")
+                    media = data.get("media", [])
+                    print(f"Response: {result_text[:200]}...")
+                else:
+                    status = "error"
+                    result_text = f"API error ({res.status_code}): {await _read_head(res, 300)}"
+                    print(f"ERROR: {result_text}")
         except Exception as e:
             status = "error"
             result_text = str(e)[:500]
             print(f"ERROR: {e}")
 
-        # 2. Deliver response via Telegram if the agent has a Telegram channel
+        # 2. Deliver via Telegram and 3. report status back to the API; the two
+        # target different hosts and don't depend on each other, so run them together
+        jobs = []
         if result_text and status == "success":
-            agent_config = fetch_agent_config(client)
-            channel_type = agent_config.get("channel_type")
-            channel_config = agent_config.get("channel_config") or {}
-
-            if channel_type == "telegram":
-                bot_token = channel_config.get("bot_token")
-                chat_id = channel_config.get("chat_id")
-                if bot_token and chat_id:
-                    print(f"Delivering to Telegram chat_id={chat_id}")
-                    deliver_telegram(client, bot_token, chat_id, result_text, media)
-                elif not chat_id:
-                    print("Telegram delivery skipped — no chat_id yet (send a message to the bot first)")
-
-        # 3. Report status back to API
+            jobs.append(deliver_response(client, config_task, result_text, media))
+        else:
+            config_task.cancel()
         if CRON_JOB_ID:
-            try:
-                client.patch(
-                    f"{API_URL}/api/cron/{CRON_JOB_ID}",
-                    json={
-                        "last_run": datetime.now(timezone.utc).isoformat(),
-                        "last_result": result_text[:500],
-                        "last_status": status,
-                    },
-                )
-                print(f"Reported status: {status}")
-            except Exception as e:
-                print(f"Failed to report status: {e}")
+            jobs.append(report_status(client, status, result_text))
+        await asyncio.gather(*jobs)
 
     sys.exit(0 if status == "success" else 1)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -3,22 +3,24 @@ Falcon-Eye Recorder Service
 Records video from camera streams using FFmpeg
 """
 import os
+import re
 import asyncio
-import subprocess
 import signal
 import logging
-from datetime import datetime
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
-import httpx
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("falcon-eye-recorder")
 
-app = FastAPI(title="Falcon-Eye Recorder")
+app = FastAPI(title="Falcon-Eye Recorder", default_response_class=ORJSONResponse)
 
 # Configuration from environment
 CAMERA_ID = os.getenv("CAMERA_ID", "unknown")
@@ -30,6 +32,42 @@ SEGMENT_DURATION = int(os.getenv("SEGMENT_DURATION", "3600"))
 RECORDING_CHUNK_MINUTES = int(os.getenv("RECORDING_CHUNK_MINUTES", "15"))
 NODE_NAME = os.getenv("NODE_NAME", "")
 INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "")
+MAX_CONCURRENT_STARTS = int(os.getenv("MAX_CONCURRENT_STARTS", "2"))
+NOTIFY_QUEUE_SIZE = 256
+# Longest wait between attempts at an undelivered notification
+NOTIFY_RETRY_MAX = 60.0
+# Attempts per notification before it is given up (~25 min at the backoff cap)
+NOTIFY_MAX_ATTEMPTS = 30
+# API responses worth retrying (gateway/overload); other 5xx won't get better by repeating
+NOTIFY_RETRY_STATUSES = {502, 503, 504}
+
+# The input/codec half of the ffmpeg command depends only on STREAM_URL, so it is
+# built once here; each chunk appends its duration and output path
+_MJPEG_URL_RE = re.compile(r"/$|mjpe?g", re.IGNORECASE)
+IS_HTTP = STREAM_URL.startswith(("http://", "https://"))
+IS_MJPEG = _MJPEG_URL_RE.search(STREAM_URL) is not None
+FRAG_MOVFLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+if IS_MJPEG:
+    _FFMPEG_INPUT_ARGS = (
+        "ffmpeg", "-y", "-nostats",
+        "-use_wallclock_as_timestamps", "1",
+        "-f", "mjpeg", "-i", STREAM_URL,
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
+    )
+elif IS_HTTP:
+    _FFMPEG_INPUT_ARGS = (
+        "ffmpeg", "-y", "-nostats",
+        "-use_wallclock_as_timestamps", "1",
+        "-i", STREAM_URL,
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
+        "-c:a", "aac", "-b:a", "64k",
+    )
+else:
+    _FFMPEG_INPUT_ARGS = (
+        "ffmpeg", "-y", "-nostats", "-rtsp_transport", "tcp", "-i", STREAM_URL,
+        "-c:v", "copy", "-c:a", "aac", "-b:a", "64k",
+    )
 
 def _api_headers() -> dict:
     """Headers for internal API calls."""
@@ -38,13 +76,35 @@ def _api_headers() -> dict:
         h["X-Internal-Key"] = INTERNAL_API_KEY
     return h
 
+
+@dataclass(slots=True)
+class Recording:
+    """The chunk FFmpeg is currently writing"""
+    id: str
+    file_path: str
+    file_name: str
+    start_time: str
+    log_path: str
+    stderr_task: asyncio.Task
+    stderr_tail: deque
+
+
 # Recording state
-current_process: Optional[subprocess.Popen] = None
-current_recording: Optional[dict] = None
+current_process: Optional[asyncio.subprocess.Process] = None
+current_recording: Optional[Recording] = None
 _monitor_task: Optional[asyncio.Task] = None
 _chunk_task: Optional[asyncio.Task] = None
 _stop_requested: bool = False
+# Shared keep-alive client for API notifications (httpx.AsyncClient), created
+# on first use so httpx is only imported once there is something to report
+_api_client = None
+# API notifications waiting to be sent, drained in order by _notify_worker
+_notify_queue: asyncio.Queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+_notify_worker_task: Optional[asyncio.Task] = None
 recording_lock = asyncio.Lock()
+# Bulkhead around /start so a burst of start calls can't pile up FFmpeg spawns
+_start_bulkhead = asyncio.Semaphore(MAX_CONCURRENT_STARTS)
+_starts_pending = 0
 
 
 class RecordingInfo(BaseModel):
@@ -77,70 +137,230 @@ class StopResponse(BaseModel):
     recording: Optional[RecordingInfo] = None
 
 
-def generate_filename() -> tuple[str, str]:
+def _utcnow() -> datetime:
+    """Naive UTC now; the API stores recording times as naive UTC"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def generate_filename(ts: time.struct_time) -> tuple[str, str]:
     """Generate recording filename with timestamp"""
-    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    timestamp = time.strftime("%Y%m%d_%H%M%S", ts)
     safe_name = CAMERA_NAME.replace(" ", "_").replace("/", "-")[:30]
     filename = f"{safe_name}_{timestamp}.mp4"
     filepath = os.path.join(RECORDINGS_PATH, CAMERA_ID, filename)
     return filepath, filename
 
 
-async def notify_api_start(recording_id: str, file_path: str, file_name: str, start_time: datetime):
-    """Notify main API that recording started"""
+class CircuitBreaker:
+    """Fail fast on API notifications while the API is down.
+
+    Closed until `threshold` consecutive failures, then open for `cooldown`
+    seconds; after that a single trial call is let through (half-open) and its
+    outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.failures < self.threshold:
+            return True
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a trial call through (0 when closed)"""
+        if self.failures < self.threshold:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+_api_breaker = CircuitBreaker()
+
+
+def _get_api_client():
+    global _api_client
+    if _api_client is None:
+        import httpx
+        _api_client = httpx.AsyncClient(
+            base_url=API_URL,
+            timeout=10,
+            headers=_api_headers(),
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=30),
+        )
+    return _api_client
+
+
+def _notify_api(method: str, path: str, payload: dict, event: str):
+    """Queue a recording notification for the main API"""
     try:
-        async with httpx.AsyncClient(timeout=10, headers=_api_headers()) as client:
-            payload = {
-                "id": recording_id,
-                "camera_id": CAMERA_ID,
-                "camera_name": CAMERA_NAME,
-                "file_path": file_path,
-                "file_name": file_name,
-                "start_time": start_time.isoformat(),
-                "status": "recording",
-            }
-            if NODE_NAME:
-                payload["node_name"] = NODE_NAME
-            await client.post(f"{API_URL}/api/recordings/", json=payload)
-    except Exception as e:
-        logger.warning("Failed to notify API of recording start: %s", e)
+        _notify_queue.put_nowait((method, path, payload, event))
+    except asyncio.QueueFull:
+        logger.error("Notification queue full, dropping recording %s notification", event)
 
 
-async def notify_api_stop(recording_id: str, end_time: datetime, file_size: int):
-    """Notify main API that recording stopped"""
+async def _notify_worker():
+    """Send queued notifications one at a time, so they reach the API in order.
+
+    A notification that can't be delivered (API down, breaker open) stays at the
+    head of the queue and is retried with backoff, so recording state changes
+    are delayed during an outage rather than lost. After NOTIFY_MAX_ATTEMPTS it
+    is given up so one notification can't hold up the rest indefinitely.
+    """
+    while True:
+        method, path, payload, event = await _notify_queue.get()
+        try:
+            delay = 1.0
+            for attempt in range(1, NOTIFY_MAX_ATTEMPTS + 1):
+                if await _send_notification(method, path, payload, event):
+                    break
+                if attempt == NOTIFY_MAX_ATTEMPTS:
+                    logger.error("Giving up on recording %s notification after %d attempts", event, attempt)
+                    break
+                await asyncio.sleep(max(delay, _api_breaker.retry_in()))
+                delay = min(delay * 2, NOTIFY_RETRY_MAX)
+        finally:
+            _notify_queue.task_done()
+
+
+async def _send_notification(method: str, path: str, payload: dict, event: str) -> bool:
+    """Send a recording notification to the main API through the circuit breaker.
+
+    Returns False if it should be retried later: transport errors and
+    NOTIFY_RETRY_STATUSES. Any other 5xx is logged and not retried.
+    """
+    if not _api_breaker.allow():
+        return False
     try:
-        async with httpx.AsyncClient(timeout=10, headers=_api_headers()) as client:
-            await client.patch(f"{API_URL}/api/recordings/{recording_id}", json={
-                "end_time": end_time.isoformat(),
-                "status": "completed",
-                "file_size_bytes": file_size,
-            })
+        res = await _get_api_client().request(method, path, json=payload)
     except Exception as e:
-        logger.warning("Failed to notify API of recording stop: %s", e)
+        _api_breaker.record_failure()
+        logger.warning("Failed to notify API of recording %s, will retry: %s", event, e)
+        return False
+    if res.status_code >= 500:
+        _api_breaker.record_failure()
+        if res.status_code in NOTIFY_RETRY_STATUSES:
+            logger.warning("API returned HTTP %d for recording %s notification, will retry", res.status_code, event)
+            return False
+        logger.error("API rejected recording %s notification with HTTP %d", event, res.status_code)
+        return True
+    _api_breaker.record_success()
+    return True
+
+
+def notify_api_start(recording_id: str, file_path: str, file_name: str, start_time: datetime):
+    """Notify main API that recording started"""
+    payload = {
+        "id": recording_id,
+        "camera_id": CAMERA_ID,
+        "camera_name": CAMERA_NAME,
+        "file_path": file_path,
+        "file_name": file_name,
+        "start_time": start_time.isoformat(),
+        "status": "recording",
+    }
+    if NODE_NAME:
+        payload["node_name"] = NODE_NAME
+    _notify_api("POST", "/api/recordings/", payload, "start")
+
+
+def notify_api_stop(recording_id: str, end_time: datetime, file_size: int):
+    """Notify main API that recording stopped"""
+    _notify_api("PATCH", f"/api/recordings/{recording_id}", {
+        "end_time": end_time.isoformat(),
+        "status": "completed",
+        "file_size_bytes": file_size,
+    }, "stop")
 
 
-async def notify_api_failed(recording_id: str, error_message: str):
+def notify_api_failed(recording_id: str, error_message: str):
     """Notify main API that recording failed"""
+    _notify_api("PATCH", f"/api/recordings/{recording_id}", {
+        "end_time": _utcnow().isoformat(),
+        "status": "failed",
+        "error_message": error_message,
+    }, "failure")
+
+
+async def _drain_stderr(stream: asyncio.StreamReader, log_path: str, tail: deque):
+    """Copy ffmpeg's stderr into its log file, keeping the last bytes in `tail`.
+
+    The pipe is always read to EOF: if the log can't be opened or written
+    (disk full, read-only volume) the log is dropped, never the draining,
+    otherwise ffmpeg would block on a full stderr pipe and stall the recording.
+    """
+    # Opened off the event loop; the 1 MiB buffer means the log is written in a few large writes
+    try:
+        log_fh = await asyncio.to_thread(open, log_path, "wb", 1 << 20)
+    except OSError as e:
+        logger.warning("Can't open ffmpeg log %s, keeping only the in-memory tail: %s", log_path, e)
+        log_fh = None
     try:
-        async with httpx.AsyncClient(timeout=10, headers=_api_headers()) as client:
-            await client.patch(f"{API_URL}/api/recordings/{recording_id}", json={
-                "end_time": datetime.utcnow().isoformat(),
-                "status": "failed",
-                "error_message": error_message,
-            })
+        while chunk := await stream.read(65536):
+            tail.extend(chunk[-tail.maxlen:])
+            if log_fh is not None:
+                try:
+                    log_fh.write(chunk)
+                except OSError as e:
+                    logger.warning("Writing ffmpeg log %s failed, dropping the rest: %s", log_path, e)
+                    _close_quietly(log_fh)
+                    log_fh = None
+    finally:
+        if log_fh is not None:
+            _close_quietly(log_fh)
+
+
+def _close_quietly(fh) -> None:
+    """Close a file whose buffered writes may fail (e.g. ENOSPC on flush)"""
+    try:
+        fh.close()
+    except OSError:
+        pass
+
+
+async def _stderr_done(recording: Recording):
+    """Wait for the stderr drain to hit EOF and close the log file"""
+    try:
+        await recording.stderr_task
     except Exception as e:
-        logger.warning("Failed to notify API of recording failure: %s", e)
+        logger.warning("FFmpeg stderr drain failed for %s: %s", recording.id, e)
+
+
+def _file_size(path: Optional[str]) -> int:
+    """Size of a recording file, 0 if missing (one stat call)"""
+    if not path:
+        return 0
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
 
 
-async def _finalize_chunk(recording_info: dict):
+def _finalize_chunk(recording_info: Optional[Recording]):
     """Report a completed chunk to the API."""
-    end_time = datetime.utcnow()
-    file_size = 0
-    fp = recording_info.get("file_path")
-    if fp and os.path.exists(fp):
-        file_size = os.path.getsize(fp)
-    if recording_info.get("id"):
-        await notify_api_stop(recording_info["id"], end_time, file_size)
+    if recording_info is None:
+        return
+    # The stderr log is only kept for failed chunks
+    try:
+        os.remove(recording_info.log_path)
+    except OSError:
+        pass
+    end_time = _utcnow()
+    file_size = _file_size(recording_info.file_path)
+    notify_api_stop(recording_info.id, end_time, file_size)
 
 
 async def _start_new_chunk() -> bool:
@@ -153,60 +373,46 @@ async def _start_new_chunk() -> bool:
     recording_dir = os.path.join(RECORDINGS_PATH, CAMERA_ID)
     Path(recording_dir).mkdir(parents=True, exist_ok=True)
 
-    file_path, file_name = generate_filename()
-    start_time = datetime.utcnow()
-    recording_id = f"{CAMERA_ID}_{start_time.strftime('%Y%m%d%H%M%S')}"
+    # One clock read for the file name, recording ID and start time
+    now = time.time()
+    ts = time.gmtime(now)
+    file_path, file_name = generate_filename(ts)
+    start_time = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+    recording_id = f"{CAMERA_ID}_{time.strftime('%Y%m%d%H%M%S', ts)}"
     log_path = file_path + ".log"
 
     chunk_seconds = RECORDING_CHUNK_MINUTES * 60
 
-    is_http = STREAM_URL.startswith("http://") or STREAM_URL.startswith("https://")
-    is_mjpeg = STREAM_URL.endswith("/") or "mjpeg" in STREAM_URL.lower() or "mjpg" in STREAM_URL.lower()
-    frag_movflags = "frag_keyframe+empty_moov+default_base_moof"
-
-    if is_mjpeg:
-        cmd = [
-            "ffmpeg", "-y",
-            "-use_wallclock_as_timestamps", "1",
-            "-f", "mjpeg", "-i", STREAM_URL,
-            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
-            "-t", str(chunk_seconds), "-movflags", frag_movflags, "-f", "mp4", file_path,
-        ]
-    elif is_http:
-        cmd = [
-            "ffmpeg", "-y",
-            "-use_wallclock_as_timestamps", "1",
-            "-i", STREAM_URL,
-            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "23",
-            "-c:a", "aac", "-b:a", "64k",
-            "-t", str(chunk_seconds), "-movflags", frag_movflags, "-f", "mp4", file_path,
-        ]
-    else:
-        cmd = [
-            "ffmpeg", "-y", "-rtsp_transport", "tcp", "-i", STREAM_URL,
-            "-c:v", "copy", "-c:a", "aac", "-b:a", "64k",
-            "-t", str(chunk_seconds), "-movflags", frag_movflags, "-f", "mp4", file_path,
-        ]
-
-    logger.info("Starting FFmpeg chunk: %s", " ".join(cmd))
-    log_fh = open(log_path, "w")
-    current_process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=log_fh)
-
-    current_recording = {
-        "id": recording_id,
-        "file_path": file_path,
-        "file_name": file_name,
-        "start_time": start_time.isoformat(),
-        "log_path": log_path,
-        "log_fh": log_fh,
-    }
+    cmd = [
+        *_FFMPEG_INPUT_ARGS,
+        "-t", str(chunk_seconds), "-movflags", FRAG_MOVFLAGS, "-f", "mp4", file_path,
+    ]
+
+    logger.info("Starting FFmpeg chunk (%ds): %s", chunk_seconds, file_path)
+    # Spawned through asyncio so the fork/exec doesn't stall /health and /status
+    current_process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    # stderr is teed to the log file, and its tail kept in memory for crash reports
+    stderr_tail = deque(maxlen=1000)
+    stderr_task = asyncio.create_task(_drain_stderr(current_process.stderr, log_path, stderr_tail))
+
+    current_recording = Recording(
+        id=recording_id,
+        file_path=file_path,
+        file_name=file_name,
+        start_time=start_time.isoformat(),
+        log_path=log_path,
+        stderr_task=stderr_task,
+        stderr_tail=stderr_tail,
+    )
 
-    asyncio.create_task(notify_api_start(recording_id, file_path, file_name, start_time))
-    _monitor_task = asyncio.create_task(monitor_ffmpeg_process(recording_id, log_path))
+    notify_api_start(recording_id, file_path, file_name, start_time)
+    _monitor_task = asyncio.create_task(monitor_ffmpeg_process(recording_id))
     return True
 
 
-async def monitor_ffmpeg_process(recording_id: str, log_path: str):
+async def monitor_ffmpeg_process(recording_id: str):
     """Monitor the FFmpeg process with a hard wall-clock timer for chunk rotation.
     
     ffmpeg's -t flag is unreliable for MJPEG and some RTSP streams, so we
@@ -225,24 +431,22 @@ async def monitor_ffmpeg_process(recording_id: str, log_path: str):
         while current_process is not None:
             elapsed = asyncio.get_event_loop().time() - chunk_start
 
-            exit_code = current_process.poll()
+            exit_code = current_process.returncode
             if exit_code is not None:
-                recording_info = dict(current_recording) if current_recording else {}
+                # Recording is never mutated in place, so a plain reference
+                # survives current_recording being rebound below
+                recording_info = current_recording
 
-                # Close log file handle
-                log_fh = recording_info.get("log_fh")
-                if log_fh:
-                    try:
-                        log_fh.close()
-                    except Exception:
-                        pass
+                # Let the stderr drain reach EOF so the log and tail are complete
+                if recording_info:
+                    await _stderr_done(recording_info)
 
                 if exit_code == 0 or (exit_code in (-2, 255) and not _stop_requested):
                     # exit_code 0 = ffmpeg -t finished, -2/255 = SIGINT from our timer
                     logger.info("FFmpeg chunk finished for recording %s (exit=%d, elapsed=%.0fs)", recording_id, exit_code, elapsed)
-                    await _finalize_chunk(recording_info)
 
-                    # If not explicitly stopped, start the next chunk
+                    # If not explicitly stopped, start the next chunk before
+                    # reporting this one, so the API round-trip isn't a gap in the footage
                     if not _stop_requested:
                         current_process = None
                         current_recording = None
@@ -250,16 +454,16 @@ async def monitor_ffmpeg_process(recording_id: str, log_path: str):
                         ok = await _start_new_chunk()
                         if not ok:
                             logger.error("Failed to start next chunk")
+                        _finalize_chunk(recording_info)
                         return
+                    _finalize_chunk(recording_info)
                 else:
-                    stderr_tail = ""
-                    try:
-                        with open(log_path, "r") as f:
-                            stderr_tail = f.read()[-1000:]
-                    except Exception:
-                        stderr_tail = "(could not read ffmpeg log)"
+                    stderr_tail = (
+                        bytes(recording_info.stderr_tail).decode("utf-8", errors="replace")
+                        if recording_info else ""
+                    )
                     logger.error("FFmpeg crashed (code %d) for %s: %s", exit_code, recording_id, stderr_tail)
-                    await notify_api_failed(recording_id, f"FFmpeg exited with code {exit_code}: {stderr_tail}")
+                    notify_api_failed(recording_id, f"FFmpeg exited with code {exit_code}: {stderr_tail}")
 
                 current_process = None
                 current_recording = None
@@ -274,63 +478,103 @@ async def monitor_ffmpeg_process(recording_id: str, log_path: str):
                     pass
                 # Give ffmpeg up to 10s to finalize the file
                 try:
-                    current_process.wait(timeout=10)
-                except subprocess.TimeoutExpired:
+                    await asyncio.wait_for(current_process.wait(), timeout=10)
+                except asyncio.TimeoutError:
                     logger.warning("FFmpeg didn't stop in 10s after SIGINT, killing")
                     current_process.kill()
-                    current_process.wait(timeout=5)
+                    await asyncio.wait_for(current_process.wait(), timeout=5)
                 # Loop will pick up the exit code on next iteration
 
-            await asyncio.sleep(5)
+            # Sleep until ffmpeg exits or the chunk timer is due, whichever comes first
+            try:
+                await asyncio.wait_for(current_process.wait(), timeout=max(1.0, chunk_seconds - elapsed))
+            except asyncio.TimeoutError:
+                pass
     except asyncio.CancelledError:
         logger.info("Monitor cancelled for %s", recording_id)
-        return
+        raise
 
     logger.info("Monitor exiting — no active process for %s", recording_id)
 
 
+async def _cancel_monitor():
+    """Cancel the chunk monitor and wait for it to unwind, so it can't race the caller"""
+    global _monitor_task
+    task, _monitor_task = _monitor_task, None
+    if task and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
 @app.get("/health")
 async def health():
     """Health check"""
-    return {"status": "ok", "camera_id": CAMERA_ID}
+    return {"status": "ok", "camera_id": CAMERA_ID, "starts_pending": _starts_pending}
 
 
-@app.get("/status")
-async def get_status() -> RecordingInfo:
-    """Get current recording status"""
-    if current_recording:
-        return RecordingInfo(
-            recording_id=current_recording.get("id"),
-            camera_id=CAMERA_ID,
-            camera_name=CAMERA_NAME,
-            file_path=current_recording.get("file_path"),
-            file_name=current_recording.get("file_name"),
-            start_time=current_recording.get("start_time"),
-            status="recording" if current_process and current_process.poll() is None else "stopped",
-        )
-    return RecordingInfo(
+def _recording_info(recording: Optional[Recording], status: str) -> RecordingInfo:
+    """Build a RecordingInfo from the current Recording (trusted fields, so no validation)"""
+    if recording is None:
+        return RecordingInfo.model_construct(camera_id=CAMERA_ID, camera_name=CAMERA_NAME, status=status)
+    return RecordingInfo.model_construct(
+        recording_id=recording.id,
         camera_id=CAMERA_ID,
         camera_name=CAMERA_NAME,
-        status="idle",
+        file_path=recording.file_path,
+        file_name=recording.file_name,
+        start_time=recording.start_time,
+        status=status,
     )
 
 
+_IDLE_STATUS = _recording_info(None, "idle")
+# (recording, status, RecordingInfo) last returned by /status; rebuilt only
+# when the chunk or its status changes
+_status_cache: tuple = (None, "idle", _IDLE_STATUS)
+
+
+@app.get("/status")
+async def get_status() -> RecordingInfo:
+    """Get current recording status"""
+    global _status_cache
+    if not current_recording:
+        return _IDLE_STATUS
+    status = "recording" if current_process and current_process.returncode is None else "stopped"
+    recording, cached_status, info = _status_cache
+    if recording is not current_recording or cached_status != status:
+        info = _recording_info(current_recording, status)
+        _status_cache = (current_recording, status, info)
+    return info
+
+
 @app.post("/start")
 async def start_recording(request: Optional[StartRequest] = None) -> StartResponse:
     """Start recording (chunked — each chunk is RECORDING_CHUNK_MINUTES long)"""
-    global current_process, current_recording, _monitor_task, _stop_requested, RECORDING_CHUNK_MINUTES
+    global RECORDING_CHUNK_MINUTES, _starts_pending
 
     # Override chunk duration if provided by API
     if request and request.chunk_minutes is not None:
         RECORDING_CHUNK_MINUTES = max(1, min(60, request.chunk_minutes))
         logger.info("Chunk duration set to %d minutes (from API)", RECORDING_CHUNK_MINUTES)
 
+    _starts_pending += 1
+    try:
+        async with _start_bulkhead:
+            return await _start_recording_locked()
+    finally:
+        _starts_pending -= 1
+
+
+async def _start_recording_locked() -> StartResponse:
+    """Body of /start, run once the bulkhead admits the request"""
+    global current_process, current_recording, _stop_requested
+
     async with recording_lock:
-        if current_process and current_process.poll() is None:
+        if current_process and current_process.returncode is None:
             return StartResponse(
                 success=False,
                 message="Already recording",
-                recording=await get_status(),
+                recording=_recording_info(current_recording, "recording"),
             )
 
         if not STREAM_URL:
@@ -346,7 +590,7 @@ async def start_recording(request: Optional[StartRequest] = None) -> StartRespon
             return StartResponse(
                 success=True,
                 message=f"Recording started (chunk duration: {RECORDING_CHUNK_MINUTES} min)",
-                recording=await get_status(),
+                recording=_recording_info(current_recording, "recording"),
             )
 
         except HTTPException:
@@ -360,53 +604,43 @@ async def start_recording(request: Optional[StartRequest] = None) -> StartRespon
 @app.post("/stop")
 async def stop_recording() -> StopResponse:
     """Stop recording"""
-    global current_process, current_recording, _monitor_task, _stop_requested
+    global current_process, current_recording, _stop_requested
 
     async with recording_lock:
         if not current_process:
             return StopResponse(success=False, message="Not recording")
 
         _stop_requested = True
-        recording_info = dict(current_recording) if current_recording else {}
+        recording_info = current_recording
 
         try:
             # Cancel the background monitor so it doesn't race with us
-            if _monitor_task and not _monitor_task.done():
-                _monitor_task.cancel()
-                _monitor_task = None
+            await _cancel_monitor()
 
-            if current_process.poll() is None:
-                # Send 'q' to ffmpeg stdin for the cleanest shutdown.
-                # Falls back to SIGINT → SIGKILL.
+            # The monitor may have been cancelled mid-rollover, after it cleared current_process
+            if current_process is not None and current_process.returncode is None:
+                # SIGINT lets ffmpeg finalize the file; proc.wait() resolves from
+                # asyncio's child watcher the moment it exits. SIGKILL after 15s.
                 try:
                     current_process.send_signal(signal.SIGINT)
                 except OSError:
                     pass
 
                 try:
-                    current_process.wait(timeout=15)
-                except subprocess.TimeoutExpired:
+                    await asyncio.wait_for(current_process.wait(), timeout=15)
+                except asyncio.TimeoutError:
                     logger.warning("FFmpeg did not stop in 15s, sending SIGKILL")
                     current_process.kill()
-                    current_process.wait(timeout=5)
-
-            end_time = datetime.utcnow()
+                    await asyncio.wait_for(current_process.wait(), timeout=5)
 
-            # Close the stderr log file handle
-            log_fh = recording_info.get("log_fh")
-            if log_fh:
-                try:
-                    log_fh.close()
-                except Exception:
-                    pass
+            end_time = _utcnow()
 
-            file_size = 0
-            fp = recording_info.get("file_path")
-            if fp and os.path.exists(fp):
-                file_size = os.path.getsize(fp)
+            # Flush the rest of ffmpeg's stderr into the log file
+            if recording_info:
+                await _stderr_done(recording_info)
 
-            if recording_info.get("id"):
-                asyncio.create_task(notify_api_stop(recording_info["id"], end_time, file_size))
+                file_size = _file_size(recording_info.file_path)
+                notify_api_stop(recording_info.id, end_time, file_size)
 
             current_process = None
             current_recording = None
@@ -414,15 +648,7 @@ async def stop_recording() -> StopResponse:
             return StopResponse(
                 success=True,
                 message="Recording stopped",
-                recording=RecordingInfo(
-                    recording_id=recording_info.get("id"),
-                    camera_id=CAMERA_ID,
-                    camera_name=CAMERA_NAME,
-                    file_path=recording_info.get("file_path"),
-                    file_name=recording_info.get("file_name"),
-                    start_time=recording_info.get("start_time"),
-                    status="stopped",
-                ),
+                recording=_recording_info(recording_info, "stopped"),
             )
 
         except Exception as e:
@@ -436,9 +662,13 @@ async def serve_recording_file(camera_id: str, filename: str):
     """Serve a recording file from this node's local storage.
     Used by the API to proxy downloads from whichever node holds the file."""
     file_path = os.path.join(RECORDINGS_PATH, camera_id, filename)
-    if not os.path.exists(file_path):
+    try:
+        st = os.stat(file_path)
+    except OSError:
         raise HTTPException(status_code=404, detail="File not found on this node")
-    return FileResponse(file_path, media_type="video/mp4", filename=filename)
+    # Handing over the stat result saves FileResponse from stat'ing the file again;
+    # Range requests are served as 206 partial responses by FileResponse itself
+    return FileResponse(file_path, media_type="video/mp4", filename=filename, stat_result=st)
 
 
 @app.delete("/files/{camera_id}/{filename}")
@@ -465,32 +695,54 @@ async def delete_recording_file(camera_id: str, filename: str):
 @app.get("/files")
 async def list_local_files():
     """List all recording files on this node (for debugging)"""
-    files = []
-    for cam_dir in Path(RECORDINGS_PATH).iterdir():
-        if cam_dir.is_dir():
-            for f in cam_dir.iterdir():
-                if f.is_file():
-                    files.append({
-                        "camera_id": cam_dir.name,
-                        "filename": f.name,
-                        "size_bytes": f.stat().st_size,
-                    })
+    files = await asyncio.to_thread(_scan_recordings)
     return {"node_camera_id": CAMERA_ID, "files": files}
 
 
+def _scan_recordings() -> list[dict]:
+    """Walk RECORDINGS_PATH/<camera_id>/ with scandir (dirent types, one stat per file)"""
+    files = []
+    with os.scandir(RECORDINGS_PATH) as cam_dirs:
+        for cam_dir in cam_dirs:
+            if not cam_dir.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(cam_dir.path) as entries:
+                for f in entries:
+                    if f.is_file(follow_symlinks=False):
+                        files.append({
+                            "camera_id": cam_dir.name,
+                            "filename": f.name,
+                            "size_bytes": f.stat().st_size,
+                        })
+    return files
+
+
 @app.on_event("startup")
 async def startup():
+    global _notify_worker_task
+    _notify_worker_task = asyncio.create_task(_notify_worker())
     logger.info("Recorder ready — camera=%s stream=%s", CAMERA_ID, STREAM_URL)
+    logger.info("FFmpeg input: %s", " ".join(_FFMPEG_INPUT_ARGS))
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Clean up on shutdown"""
-    if current_process and current_process.poll() is None:
+    if current_process and current_process.returncode is None:
         logger.info("Shutting down — stopping active recording")
         await stop_recording()
+    await _cancel_monitor()
+    # Give queued notifications (e.g. the final stop) a moment to go out
+    try:
+        await asyncio.wait_for(_notify_queue.join(), timeout=5)
+    except asyncio.TimeoutError:
+        logger.warning("Shutting down with %d API notifications unsent", _notify_queue.qsize())
+    if _notify_worker_task is not None:
+        _notify_worker_task.cancel()
+    if _api_client is not None:
+        await _api_client.aclose()
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    uvicorn.run(app, host="0.0.0.0", port=8080, loop="uvloop", http="httptools")